@@ -1,125 +1,57 @@
 #!/usr/bin/env python3
-import json
-from datetime import datetime, timedelta
-import time
-import yfinance as yf
+from datetime import datetime
+import logging
 #import readline
 from stockutils import utils
+from stockutils import panel
+from stockutils import universe
+from stockutils import screen
+from stockutils import pipeline
+from stockutils import history
 from tabulate import tabulate
-import re
-import os
-import contextlib
 from prompt_toolkit import prompt
 from prompt_toolkit.completion import FuzzyWordCompleter, DynamicCompleter
 
-begin = "2021-01-01"
+begin = history.BEGIN
 today = datetime.today().date()
 
 
-exchange = {}
-
-# Open the list and read line by line
-with open('list.txt', 'r') as file:
-    current_key = None
-    for line in file:
-        # Strip leading/trailing whitespace
-        line = line.strip()
-        # Replace comma followed by one or more spaces with a comma
-        line = re.sub(r',\s+', ',', line)
-        
-        # Skip empty lines
-        if not line or line.startswith('#'):
-            continue
-        
-        # Split the line into parts
-        parts = line.split(' ', 2)  # Split only on the first two spaces
-        
-        key = parts[0]
-        sym = parts[1]
-        # Remove the square brackets and split the third part into a list
-        names = parts[2].strip('[]').split(',')
-        
-        # Check if the current line contains a new key
-        if key != current_key:
-            current_key = key
-            if current_key not in exchange:
-                exchange[current_key] = {'symbol': [], 'name': []}
-        
-        # Append the name and val to the respective lists
-        exchange[current_key]['symbol'].append(sym)
-        exchange[current_key]['name'].append(names)
+exchange = universe.exchange()
 
 user_input = input("Run analysis (y/n): ")
 if user_input == "y":
     
-    #for stock in tickers:
-    min_interval = 2  # seconds between calls
-    for key in exchange:
-        tickers = exchange[key]["symbol"]
-        last_call = 0
-        for stock in tickers:
-            start = begin
-            end = today
-            if key == "US":
-                nam = stock
-                file = "yfdata/"+nam+"."+key+".json"
-            else:
-                nam = stock+"."+key
-                file = "yfdata/"+nam+".json"
-            d = utils.rd_d(file)
-            if d:
-                start = d["Date"][len(d["Date"])-1]
-                date_object = datetime.strptime(start, "%Y-%m-%d")
-                date_object = date_object + timedelta(days=1)
-                start = date_object.strftime("%Y-%m-%d")
-            
-            # Fetch historical stock data
-            now = time.time()
-            elapsed = now - last_call
-            time.sleep(max(0, min_interval - elapsed))
-
-            ## supress stderr from yf
-            with open(os.devnull, 'w') as f, contextlib.redirect_stdout(f), contextlib.redirect_stderr(f):
-                df = yf.download(nam, start=start, end=end, auto_adjust=False, progress=False)
-            if df.empty:
-                print(f"No data found for {nam} between {start} - {end}")
-            else:
-                print(f"Downloaded data for {nam} between {start} - {end}")
-            # Update last_call timestamp
-            last_call = time.time()
-            
-            d = utils.append_yf2d(df, d)
-        
-            utils.analyse(stock, 60, d)
-            utils.analyse(stock, 120, d)
-            utils.analyse(stock, 360, d)
-            if key == "US":
-                nam = stock+"."+key
-            file = "yfdata/"+nam+".json"
-
-            # Write the dictionary to a JSON file
-            with open(file, 'w') as json_file:
-                json.dump(d, json_file, indent=4)
-
-table = []
-
-for key in exchange:
-    tickers = exchange[key]["symbol"] 
-    for i, stock in enumerate(tickers):
-        sname = exchange[key]["name"][i][0]
-        nam = stock + "." + key
-        fname = "yfdata/" + nam + ".json"
-        d = utils.rd_d(fname)
-
-        reco = utils.is_close_to_max_min(d["Slope60"])
-        #if reco == "neutral":
-        #    continue
-
-        label = f"{sname} [{nam}]"
-        table.append([label, reco])
-
-# Sort by recommendation
-table = sorted(table, key=lambda x: x[1])
+    # Start date of every ticker that is behind, from the store manifest
+    tickers = universe.load()["tickers"]
+    starts = pipeline.plan([t["name"] for t in tickers.values()], today, begin)
+    jobs = {nam: (t["name"], starts[t["name"]]) for nam, t in tickers.items() if t["name"] in starts}
+    print(f"{len(jobs)} of {len(tickers)} tickers need new data")
+
+    end = today
+    ## supress errors from yf
+    logging.getLogger("yfinance").setLevel(logging.CRITICAL)
+
+    def report(nam, df):
+        name, start = jobs[nam]
+        if df.empty:
+            print(f"No data found for {nam} between {start} - {end}")
+        else:
+            print(f"Downloaded data for {nam} between {start} - {end}")
+
+    # Download, merge, slopes and writes overlap, see stockutils/pipeline.py
+    stages = pipeline.run(jobs, end, on_fetched=report)
+    for stage in ("fetch", "merge", "compute", "write"):
+        print(stages[stage])
+    print(f"total    {stages['wall']:.2f}s")
+
+# Rank from the memory-mapped panel in one pass, see stockutils/screen.py
+names = universe.names()
+if panel.stale(names):
+    panel.build(names)
+ranked = screen.screen(names, fields=["Slope60"])
+
+display = {t["name"]: t["names"][0] for t in universe.load()["tickers"].values()}
+table = [[f"{display[nam]} [{nam}]", reco] for nam, reco in zip(ranked["name"], ranked["Rec60"])]
 
 headers = ["Name", "Rec60"]
 
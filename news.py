@@ -1,57 +1,9 @@
-import yfinance as yf
-import json
-import os
-import re
-from datetime import datetime
+from stockutils import universe
+from stockutils import harvest
+from stockutils import newsindex
 
-exchange = {}
-
-def get_stock_news(ticker_symbol):
-    ticker = yf.Ticker(ticker_symbol)
-    return ticker.news
-
-def load_existing_data(filename):
-    try:
-        with open(filename, 'r') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return []
-
-def save_news_to_file(news_list, filename):
-    with open(filename, 'w') as file:
-        json.dump(news_list, file, indent=4)
-
-def process_stock_news(ticker_symbol, directory="yfnews", file_extension="news.json"):
-    #print(f"Processing news for {ticker_symbol}...")
-    
-    # Ensure the directory exists
-    os.makedirs(directory, exist_ok=True)
-    
-    filename = os.path.join(directory, f"{ticker_symbol}_{file_extension}")
-    
-    # Load existing data
-    existing_data = load_existing_data(filename)
-    existing_ids = {item['id'] for item in existing_data}
-    
-    # Fetch new news
-    all_news = get_stock_news(ticker_symbol)
-    
-    # Filter out existing news
-    new_items = [item for item in all_news if item['id'] not in existing_ids]
-    
-    if new_items:
-        # Append new items to existing data
-        updated_data = new_items + existing_data
-        save_news_to_file(updated_data, filename)
-        #print(f"Added {len(new_items)} new news items for {ticker_symbol}")
-    #else:
-        #print(f"No new news items for {ticker_symbol}")
-    
-    return len(new_items)
-
-def display_news(stock_symbol, directory="yfnews", file_extension="news.json"):
-    filename = os.path.join(directory, f"{stock_symbol}_{file_extension}")
-    news_data = load_existing_data(filename)
+def display_news(stock_symbol, directory=harvest.DIRECTORY):
+    news_data = harvest.load(stock_symbol, directory)
     
     if not news_data:
         print(f"No news found for {stock_symbol}")
@@ -78,6 +30,15 @@ def display_news(stock_symbol, directory="yfnews", file_extension="news.json"):
         except ValueError:
             print("Invalid input. Please enter a number.")
 
+def search_news(words, limit=20):
+    if not words:
+        return
+    hits = newsindex.search(newsindex.phrase(words), limit=limit)
+    if not hits:
+        print(f"No news matching {words}")
+        return
+    for hit in hits:
+        print(f"{hit['published'][:10]}  {hit['symbol']:<12} {hit['title']}")
 
 #def display_news(stock_symbol, directory="yfnews", file_extension="news.json"):
 #    filename = os.path.join(directory, f"{stock_symbol}_{file_extension}")
@@ -95,57 +56,21 @@ def display_news(stock_symbol, directory="yfnews", file_extension="news.json"):
 #        print(f"Summary: {content.get('summary', 'N/A')[:100]}...")  # Display first 100 characters of summary
 #        print("---")
 #
-# Open the list and read line by line
-with open('list.txt', 'r') as file:
-    current_key = None
-    for line in file:
-        # Strip leading/trailing whitespace
-        line = line.strip()
-        # Replace comma followed by one or more spaces with a comma
-        line = re.sub(r',\s+', ',', line)
-        
-        # Skip empty lines
-        if not line:
-            continue
-        
-        # Split the line into parts
-        parts = line.split(' ', 2)  # Split only on the first two spaces
-        
-        key = parts[0]
-        sym = parts[1]
-        # Remove the square brackets and split the third part into a list
-        names = parts[2].strip('[]').split(',')
-        
-        # Check if the current line contains a new key
-        if key != current_key:
-            current_key = key
-            if current_key not in exchange:
-                exchange[current_key] = {'symbol': [], 'name': []}
-        
-        # Append the name and val to the respective lists
-        exchange[current_key]['symbol'].append(sym)
-        exchange[current_key]['name'].append(names)
-
-stock_list = [ ]
-for key in exchange:
-    tickers = exchange[key]["symbol"]
-    for stock in tickers:
-        if key == "US":
-            nam = stock
-        else:
-            nam = stock+"."+key
-        stock_list.append(nam)
+stock_list = universe.yahoo_symbols()
 
 user_input = input("Get news (y/n): ")
 if user_input == "y":
     
-    for stock in stock_list:
-        new_items_count = process_stock_news(stock)
+    for stock, new_items_count in harvest.harvest(stock_list):
         print(f"Total new items for {stock}: {new_items_count}")
         #print("---")
 
 while True:
-    stock_symbol = input("\nEnter name (or 'quit' to exit): ").upper()
+    text = input("\nEnter name, /words to search all news (or 'quit' to exit): ").strip()
+    if text.startswith("/"):
+        search_news(text[1:].strip())
+        continue
+    stock_symbol = text.upper()
     if stock_symbol == 'QUIT':
         break
     if stock_symbol in stock_list:
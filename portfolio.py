@@ -1,8 +1,11 @@
 import os
-import re
 import pandas as pd
-import yfinance as yf
 import streamlit as st
+from stockutils import universe
+from stockutils import portfolio as engine
+from stockutils import txndb
+from stockutils import quotes
+from stockutils import history
 
 # Set up Streamlit page configuration
 st.set_page_config(layout="wide", page_title="Portfolio Tracker")
@@ -10,7 +13,8 @@ st.title("📈 Portfolio Dashboard")
 
 # Input files
 csv_file = "txn.csv"
-output_file = "transactions_cleaned.csv"
+output_file = "transactions_cleaned.csv"  # legacy store, imported once
+db_file = "transactions.db"
 exclude_file = "exclude.txt"  
 
 def read_transactions(file_path):
@@ -30,40 +34,27 @@ def read_transactions(file_path):
             df[col] = pd.to_numeric(df[col], errors="coerce")
     return df
 
+@st.cache_resource
+def quote_service():
+    return quotes.QuoteService(ttl=300)
+
 # =========================================================
 # READ & MERGE DATABASE
 # =========================================================
-if os.path.exists(csv_file):
-    new_df = read_transactions(csv_file)
-    incoming_rows = len(new_df)
-else:
+if not os.path.exists(csv_file):
     st.error(f"Could not find input file: {csv_file}")
     st.stop()
 
-if os.path.exists(output_file):
-    old_df = pd.read_csv(output_file, parse_dates=["Datum"])
-    old_rows = len(old_df)
-else:
-    old_df = pd.DataFrame()
-    old_rows = 0
-
-unique_columns = ["Datum", "Konto", "Typ av transaktion", "Värdepapper/beskrivning", "Antal", "Kurs", "Belopp", "ISIN"]
-
-if old_df.empty:
-    combined_df = new_df.copy()
-else:
-    for col in unique_columns:
-        if col not in old_df.columns: old_df[col] = ""
-        if col not in new_df.columns: new_df[col] = ""
-    old_keys = old_df[unique_columns].astype(str).agg("|".join, axis=1)
-    new_keys = new_df[unique_columns].astype(str).agg("|".join, axis=1)
-    old_key_set = set(old_keys)
-    mask_new = ~new_keys.isin(old_key_set)
-    new_only_df = new_df[mask_new]
-    combined_df = pd.concat([old_df, new_only_df], ignore_index=True)
-
-combined_df = combined_df.sort_values(by="Datum")
-combined_df.to_csv(output_file, index=False)
+# Only parses and merges txn.csv when it changed since the last ingest
+sync_stats = txndb.sync(csv_file, db_file, read_transactions, legacy_file=output_file)
+incoming_rows = sync_stats["incoming"]
+old_rows = sync_stats["stored"]
+
+@st.cache_data
+def load_transactions(db_file, version):
+    return txndb.load(db_file)
+
+combined_df = load_transactions(db_file, os.path.getmtime(db_file))
 
 # =========================================================
 # READ EXCLUSION LIST
@@ -80,6 +71,7 @@ st.sidebar.header("🔄 Market Data Control")
 
 if st.sidebar.button("♻️ Reload Live Prices", use_container_width=True):
     st.cache_data.clear()  
+    quote_service().clear()
     st.toast("Cache cleared! Fetching fresh live market prices...", icon="🔄")
 
 st.sidebar.markdown("---")
@@ -91,61 +83,28 @@ st.sidebar.write(f"Total rows in database: `{len(combined_df)}`")
 # =========================================================
 # STOCK SYMBOL MAPPING & UTILITIES (CACHED)
 # =========================================================
-symbol_map = {}
-list_file = "list.txt"
-if os.path.exists(list_file):
-    with open(list_file, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line: continue
-            match = re.match(r"^([A-Z]{1,2})\s+([^\s]+)\s+\[(.*)\]$", line)
-            if not match: continue
-            market, symbol, aliases = match.group(1), match.group(2), match.group(3)
-            yahoo_symbol = symbol if market == "US" else f"{symbol}.{market}"
-            alias_list = [a.strip().lower() for a in aliases.split(",")]
-            alias_list.append(symbol.lower())
-            for alias in alias_list:
-                symbol_map[alias] = yahoo_symbol
+symbol_map = universe.aliases() if os.path.exists(universe.LIST) else {}
 
 def find_yahoo_symbol(stock_name):
     if pd.isna(stock_name): return None
-    return symbol_map.get(str(stock_name).strip().lower(), None)
+    return symbol_map.get(universe.normalize(stock_name), None)
+
+live_quotes = quote_service()
 
-@st.cache_data(ttl=300)
 def get_live_stock_price(yahoo_symbol):
-    if not yahoo_symbol: return None
-    try:
-        ticker = yf.Ticker(yahoo_symbol)
-        price = ticker.fast_info.get("lastPrice")
-        if price is not None and str(yahoo_symbol).upper().endswith(".L"):
-            price = price / 100.0
-        return price
-    except:
-        return None
+    return live_quotes.price(yahoo_symbol)
 
-@st.cache_data(ttl=300)
 def get_live_exchange_rate(from_currency, to_currency="SEK"):
-    if pd.isna(from_currency) or from_currency.strip().upper() == to_currency:
-        return 1.0
-    pair = f"{from_currency.strip().upper()}{to_currency}=X"
-    try:
-        ticker = yf.Ticker(pair)
-        rate = ticker.fast_info.get("lastPrice")
-        if rate is not None: return float(rate)
-    except:
-        pass
-    return 1.0
+    return live_quotes.fx(from_currency, to_currency)
 
 def fetch_weekly_historical_prices(yahoo_symbol, start_date):
     try:
-        ticker = yf.Ticker(yahoo_symbol)
-        hist = ticker.history(start=start_date, interval="1wk")
+        hist = history.weekly(yahoo_symbol, start=start_date)
         if hist.empty:
             return None
-        hist.index = hist.index.tz_localize(None)
         if str(yahoo_symbol).upper().endswith(".L"):
-            hist["Close"] = hist["Close"] / 100.0
-        return hist["Close"]
+            hist["Adj Close"] = hist["Adj Close"] / 100.0
+        return hist["Adj Close"].rename("Close")
     except:
         return None
 
@@ -153,63 +112,12 @@ def fetch_weekly_historical_prices(yahoo_symbol, start_date):
 # BUILD PORTFOLIO ENGINE (MOVING METHOD MODEL)
 # =========================================================
 portfolio_df_input = combined_df[combined_df["Typ av transaktion"].str.lower().isin(["köp", "sälj"])]
-portfolio = {}
-
-for _, row in portfolio_df_input.iterrows():
-    stock = row["Värdepapper/beskrivning"]
-    if pd.isna(stock) or str(stock).strip().lower() in exclude_stocks:
-        continue
-
-    transaction_type = str(row["Typ av transaktion"]).lower()
-    qty = 0.0 if pd.isna(row["Antal"]) else float(row["Antal"])
-    kurs = 0.0 if pd.isna(row["Kurs"]) else float(row["Kurs"])
-    courtage = 0.0 if pd.isna(row["Courtage"]) else float(row["Courtage"])
-    belopp = 0.0 if pd.isna(row["Belopp"]) else abs(float(row["Belopp"]))
-    valutakurs = 1.0 if pd.isna(row["Valutakurs"]) or row["Valutakurs"] == 0 else float(row["Valutakurs"])
-    currency = "SEK" if pd.isna(row["Instrumentvaluta"]) else row["Instrumentvaluta"]
-
-    if stock not in portfolio:
-        portfolio[stock] = {
-            "V": 0.0, "D": 0.0, "N": 0.0, "B": 0.0, "B_local": 0.0,
-            "sell_value": 0.0, "buy_value_total": 0.0, "buy_shares_total": 0.0,
-            "currency": currency
-        }
-    
-    p = portfolio[stock]
-    execution_total = ((abs(qty) * float(kurs) * valutakurs + abs(courtage)) / valutakurs)
-    execution_price_per_share = execution_total / abs(qty) if qty != 0 else 0
-    cost_per_share_sek = belopp / abs(qty) if qty != 0 else 0
-
-    today = pd.Timestamp.now().normalize()
-    days_elapsed = (today - pd.to_datetime(row["Datum"]).normalize()).days
-    if days_elapsed <= 0: days_elapsed = 1
-
-    if "köp" in transaction_type:
-        nb = abs(qty)
-        bb = cost_per_share_sek
-        bb_local = execution_price_per_share
-        
-        N2, B2, B2_local, D2, V2 = p["N"], p["B"], p["B_local"], p["D"], p["V"]
-        
-        V3 = V2 + (nb * bb)
-        N3 = N2 + nb
-        B3 = ((B2 * N2) + (nb * bb)) / N3 if N3 > 0 else 0
-        B3_local = ((B2_local * N2) + (nb * bb_local)) / N3 if N3 > 0 else 0
-        D3 = ((B2 * N2 * D2) + (nb * bb * days_elapsed)) / V3 if V3 > 0 else 0.0
-            
-        p["V"], p["N"], p["B"], p["B_local"], p["D"] = V3, N3, B3, B3_local, D3
-        p["buy_value_total"] += belopp
-        p["buy_shares_total"] += nb
-        
-    elif "sälj" in transaction_type:
-        ns = abs(qty)
-        p["sell_value"] += belopp
-        N1, B1 = p["N"], p["B"]
-        if N1 > 0:
-            p["N"] = max(N1 - ns, 0.0)
-            p["V"] = p["N"] * B1
-        if p["N"] == 0.0:
-            p["V"], p["D"] = 0.0, 0.0
+portfolio = engine.build(portfolio_df_input, exclude_stocks).to_dict(orient="index")
+
+# Fetch the quotes and FX rates of all open positions in one batch
+open_positions = [(stock, data) for stock, data in portfolio.items() if data["N"] > 0]
+live_quotes.prefetch_holdings([find_yahoo_symbol(stock) for stock, _ in open_positions],
+                              {data["currency"] for _, data in open_positions})
 
 # =========================================================
 # GENERATE OUTPUT DATA
@@ -301,8 +209,10 @@ def render_historical_chart(stock_name):
     start_date = pd.Timestamp.now() - pd.Timedelta(days=int(days_duration))
 
     with st.spinner(f"Fetching historical data for {ysymb}..."):
-        # Fetch data starting from the acquisition date
-        hist = yf.Ticker(ysymb).history(start=start_date)
+        # Local daily bars from the acquisition date, only the missing tail is fetched
+        hist = history.daily(ysymb, start=start_date)
+        if not hist.empty:
+            hist["Close"] = hist["Adj Close"]
 
     if hist.empty:
         st.error(f"❌ No historical price data found since {start_date.date()}.")
@@ -1,8 +1,25 @@
 import yfinance as yf
+import numpy as np
+import pandas as pd
 import logging
+import sys
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from stockutils import download
+from stockutils import universe
+from stockutils import fundamentals
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# --- Field Access ---
+
+def _get(info, key, default=None):
+    """info.get() that also falls back to default for None and NaN values."""
+    value = info.get(key)
+    if value is None or value != value:
+        return default
+    return value
+
 # --- Piotroski F-Score Calculation (Full 9 Criteria) ---
 def calculate_piotroski_f_score(info, prev_info=None):
     """
@@ -13,14 +30,14 @@ def calculate_piotroski_f_score(info, prev_info=None):
     explanations = []
 
     # 1. Positive Net Income
-    if info.get('netIncomeToCommon', 0) > 0:
+    if _get(info, 'netIncomeToCommon', 0) > 0:
         score += 1
         explanations.append("Positive net income")
     else:
         explanations.append("Negative net income")
 
     # 2. Positive Operating Cash Flow
-    if info.get('operatingCashflow', 0) > 0:
+    if _get(info, 'operatingCashflow', 0) > 0:
         score += 1
         explanations.append("Positive operating cash flow")
     else:
@@ -28,8 +45,8 @@ def calculate_piotroski_f_score(info, prev_info=None):
 
     # 3. Higher Return on Assets (ROA) than previous year
     try:
-        roa = info.get('netIncomeToCommon', 0) / info.get('totalAssets', 1)
-        prev_roa = prev_info.get('netIncomeToCommon', 0) / prev_info.get('totalAssets', 1) if prev_info else None
+        roa = _get(info, 'netIncomeToCommon', 0) / _get(info, 'totalAssets', 1)
+        prev_roa = _get(prev_info, 'netIncomeToCommon', 0) / _get(prev_info, 'totalAssets', 1) if prev_info else None
         if prev_roa is not None and roa > prev_roa:
             score += 1
             explanations.append("ROA improved")
@@ -41,7 +58,7 @@ def calculate_piotroski_f_score(info, prev_info=None):
         explanations.append("ROA calculation error")
 
     # 4. Operating Cash Flow > Net Income
-    if info.get('operatingCashflow', 0) > info.get('netIncomeToCommon', 0):
+    if _get(info, 'operatingCashflow', 0) > _get(info, 'netIncomeToCommon', 0):
         score += 1
         explanations.append("Operating cash flow > net income")
     else:
@@ -49,8 +66,8 @@ def calculate_piotroski_f_score(info, prev_info=None):
 
     # 5. Lower Leverage (long-term debt/assets) than previous year
     try:
-        leverage = info.get('longTermDebt', 0) / info.get('totalAssets', 1)
-        prev_leverage = prev_info.get('longTermDebt', 0) / prev_info.get('totalAssets', 1) if prev_info else None
+        leverage = _get(info, 'longTermDebt', 0) / _get(info, 'totalAssets', 1)
+        prev_leverage = _get(prev_info, 'longTermDebt', 0) / _get(prev_info, 'totalAssets', 1) if prev_info else None
         if prev_leverage is not None and leverage < prev_leverage:
             score += 1
             explanations.append("Leverage decreased")
@@ -63,8 +80,8 @@ def calculate_piotroski_f_score(info, prev_info=None):
 
     # 6. Higher Current Ratio than previous year
     try:
-        cr = info.get('currentRatio', 0)
-        prev_cr = prev_info.get('currentRatio', 0) if prev_info else None
+        cr = _get(info, 'currentRatio', 0)
+        prev_cr = _get(prev_info, 'currentRatio', 0) if prev_info else None
         if prev_cr is not None and cr > prev_cr:
             score += 1
             explanations.append("Current ratio improved")
@@ -76,8 +93,8 @@ def calculate_piotroski_f_score(info, prev_info=None):
         explanations.append("Current ratio calculation error")
 
     # 7. No new shares issued (compare shares outstanding)
-    shares = info.get('sharesOutstanding', 0)
-    prev_shares = prev_info.get('sharesOutstanding', 0) if prev_info else None
+    shares = _get(info, 'sharesOutstanding', 0)
+    prev_shares = _get(prev_info, 'sharesOutstanding', 0) if prev_info else None
     if prev_shares is not None and shares <= prev_shares:
         score += 1
         explanations.append("No new shares issued")
@@ -87,8 +104,8 @@ def calculate_piotroski_f_score(info, prev_info=None):
         explanations.append("Share count trend unavailable")
 
     # 8. Higher Gross Margin than previous year
-    gm = info.get('grossMargins', 0)
-    prev_gm = prev_info.get('grossMargins', 0) if prev_info else None
+    gm = _get(info, 'grossMargins', 0)
+    prev_gm = _get(prev_info, 'grossMargins', 0) if prev_info else None
     if prev_gm is not None and gm > prev_gm:
         score += 1
         explanations.append("Gross margin improved")
@@ -98,8 +115,8 @@ def calculate_piotroski_f_score(info, prev_info=None):
         explanations.append("Gross margin trend unavailable")
 
     # 9. Higher Asset Turnover than previous year
-    at = info.get('assetTurnover', 0)
-    prev_at = prev_info.get('assetTurnover', 0) if prev_info else None
+    at = _get(info, 'assetTurnover', 0)
+    prev_at = _get(prev_info, 'assetTurnover', 0) if prev_info else None
     if prev_at is not None and at > prev_at:
         score += 1
         explanations.append("Asset turnover improved")
@@ -114,14 +131,14 @@ def calculate_piotroski_f_score(info, prev_info=None):
 
 def calculate_altman_z(info):
     try:
-        total_assets = info.get('totalAssets', 0)
-        total_current_assets = info.get('totalCurrentAssets', 0)
-        total_current_liabilities = info.get('totalCurrentLiabilities', 0)
-        retained_earnings = info.get('retainedEarnings', 0)
-        ebit = info.get('ebit', 0)
-        market_cap = info.get('marketCap', 0)
-        total_liab = info.get('totalLiab', 0)
-        total_revenue = info.get('totalRevenue', 0)
+        total_assets = _get(info, 'totalAssets', 0)
+        total_current_assets = _get(info, 'totalCurrentAssets', 0)
+        total_current_liabilities = _get(info, 'totalCurrentLiabilities', 0)
+        retained_earnings = _get(info, 'retainedEarnings', 0)
+        ebit = _get(info, 'ebit', 0)
+        market_cap = _get(info, 'marketCap', 0)
+        total_liab = _get(info, 'totalLiab', 0)
+        total_revenue = _get(info, 'totalRevenue', 0)
         if total_assets == 0 or total_liab == 0:
             return None, "Insufficient data for Altman Z-score."
         A = (total_current_assets - total_current_liabilities) / total_assets
@@ -141,16 +158,16 @@ def calculate_altman_z(info):
         return None, f"Error in Z-score calculation: {e}"
 
 def calculate_interest_coverage(info):
-    ebit = info.get('ebit', 0)
-    interest_expense = info.get('interestExpense', 0)
+    ebit = _get(info, 'ebit', 0)
+    interest_expense = _get(info, 'interestExpense', 0)
     if interest_expense:
         return ebit / abs(interest_expense)
     else:
         return None
 
 def calculate_debt_to_capital(info):
-    total_debt = info.get('totalDebt', None)
-    total_equity = info.get('totalStockholderEquity', None)
+    total_debt = _get(info, 'totalDebt', None)
+    total_equity = _get(info, 'totalStockholderEquity', None)
     if total_debt is not None and total_equity is not None and (total_debt + total_equity) != 0:
         return total_debt / (total_debt + total_equity)
     else:
@@ -159,12 +176,12 @@ def calculate_debt_to_capital(info):
 # --- Scoring Functions ---
 
 def score_profitability(info):
-    revenue_growth = info.get("revenueGrowth", 0) * 100
-    profit_margin = info.get("profitMargins", 0) * 100
-    roe = info.get("returnOnEquity", 0) * 100
-    gross_profit_margin = (info.get('grossProfits', 0) / info.get('totalRevenue', 1)) * 100 if info.get('totalRevenue') else 0
-    operating_margin = info.get('operatingMargins', 0) * 100
-    payout_ratio = info.get('payoutRatio', 0) * 100
+    revenue_growth = _get(info, "revenueGrowth", 0) * 100
+    profit_margin = _get(info, "profitMargins", 0) * 100
+    roe = _get(info, "returnOnEquity", 0) * 100
+    gross_profit_margin = (_get(info, 'grossProfits', 0) / _get(info, 'totalRevenue', 1)) * 100 if _get(info, 'totalRevenue') else 0
+    operating_margin = _get(info, 'operatingMargins', 0) * 100
+    payout_ratio = _get(info, 'payoutRatio', 0) * 100
     growth_score = min(7, (revenue_growth / 3 + profit_margin / 3 + roe / 10 + gross_profit_margin/10 + operating_margin/10))
     details = {
         "revenue_growth": revenue_growth,
@@ -178,13 +195,13 @@ def score_profitability(info):
     return growth_score, details
 
 def score_valuation(info, adj):
-    pe_ratio = info.get("trailingPE", 100) * adj["pe_factor"]
-    ps_ratio = info.get("priceToSalesTrailing12Months", 10)
-    pb_ratio = info.get("priceToBook", 10)
-    eps = info.get("trailingEps", 0)
-    forward_pe = info.get("forwardPE", 100) * adj["pe_factor"]
-    free_cashflow = info.get("freeCashflow", 0)
-    peg_ratio = info.get("pegRatio", 1)
+    pe_ratio = _get(info, "trailingPE", 100) * adj["pe_factor"]
+    ps_ratio = _get(info, "priceToSalesTrailing12Months", 10)
+    pb_ratio = _get(info, "priceToBook", 10)
+    eps = _get(info, "trailingEps", 0)
+    forward_pe = _get(info, "forwardPE", 100) * adj["pe_factor"]
+    free_cashflow = _get(info, "freeCashflow", 0)
+    peg_ratio = _get(info, "pegRatio", 1)
     valuation_score = max(4, 10 - (pe_ratio / 20 + ps_ratio / 10 + pb_ratio/15 + (5/eps if eps != 0 else 0) + forward_pe/20 + peg_ratio/10))
     details = {
         "pe_ratio": pe_ratio,
@@ -200,13 +217,13 @@ def score_valuation(info, adj):
 
 def score_financial_strength(info, adj, prev_info=None):
     # --- Classic metrics ---
-    debt_to_equity = info.get("debtToEquity", 100) * adj["debt_factor"]
-    quick_ratio = info.get("quickRatio", 1)
-    current_ratio = info.get("currentRatio", 1)
+    debt_to_equity = _get(info, "debtToEquity", 100) * adj["debt_factor"]
+    quick_ratio = _get(info, "quickRatio", 1)
+    current_ratio = _get(info, "currentRatio", 1)
     # --- Solvency metrics ---
-    total_liab = info.get("totalLiab", 0)
-    total_debt = info.get("totalDebt", total_liab)
-    cashflow_from_ops = info.get("operatingCashflow", 0)
+    total_liab = _get(info, "totalLiab", 0)
+    total_debt = _get(info, "totalDebt", total_liab)
+    cashflow_from_ops = _get(info, "operatingCashflow", 0)
     cash_flow_to_debt = (cashflow_from_ops / total_debt) if total_debt else None
     # --- Risk metrics ---
     z_score, z_zone = calculate_altman_z(info)
@@ -285,8 +302,8 @@ def score_financial_strength(info, adj, prev_info=None):
     return score, details
 
 def score_market_position(info):
-    market_cap = info.get("marketCap")
-    recommendation_key = info.get("recommendationKey")
+    market_cap = _get(info, "marketCap")
+    recommendation_key = _get(info, "recommendationKey")
     market_position_score = 5
     if market_cap:
         if market_cap > 100e9:
@@ -312,7 +329,7 @@ def score_market_position(info):
     return market_position_score, details
 
 def score_risk_volatility(info, adj):
-    beta = info.get("beta", 1.2) * adj["beta_factor"]
+    beta = _get(info, "beta", 1.2) * adj["beta_factor"]
     risk_score = max(5, 10 - beta * 4)
     details = {
         "beta": beta,
@@ -320,65 +337,313 @@ def score_risk_volatility(info, adj):
     }
     return risk_score, details
 
+# --- Sector Adjustments & Weights ---
+
+sector_adjustments = {
+    "Technology": {"pe_factor": 1.5, "debt_factor": 1.2, "beta_factor": 1.1},
+    "Financial Services": {"pe_factor": 0.8, "debt_factor": 0.7, "beta_factor": 1.2},
+    "Healthcare": {"pe_factor": 1.2, "debt_factor": 1.0, "beta_factor": 0.9},
+    "Consumer Defensive": {"pe_factor": 1.0, "debt_factor": 0.9, "beta_factor": 0.8},
+    "Consumer Cyclical": {"pe_factor": 1.3, "debt_factor": 1.1, "beta_factor": 1.3},
+    "Industrials": {"pe_factor": 1.1, "debt_factor": 1.0, "beta_factor": 1.0},
+    "Basic Materials": {"pe_factor": 0.9, "debt_factor": 1.3, "beta_factor": 1.1},
+    "Real Estate": {"pe_factor": 0.7, "debt_factor": 0.6, "beta_factor": 0.7},
+    "Utilities": {"pe_factor": 0.9, "debt_factor": 0.8, "beta_factor": 0.6},
+    "Energy": {"pe_factor": 0.7, "debt_factor": 1.3, "beta_factor": 1.3},
+    "Communication Services": {"pe_factor": 1.2, "debt_factor": 1.1, "beta_factor": 1.0}
+}
+default_adjustment = {"pe_factor": 1.0, "debt_factor": 1.0, "beta_factor": 1.0}
+
+weights = {
+    "growth": 0.27,
+    "valuation": 0.18,
+    "financial": 0.28,  # increased to reflect its importance
+    "market": 0.18,
+    "risk": 0.09
+}
+
+# --- Fetching & Cache ---
+
+CACHE_DIR = fundamentals.DIRECTORY
+CACHE_TTL = 20 * 3600  # seconds, a nightly run takes a new snapshot
+
+
+def fetch_fundamentals(ticker, cache_dir=CACHE_DIR, ttl=CACHE_TTL, limiter=None, offline=False):
+    """
+    Return (info, prev_info) for ticker from the fundamentals snapshot
+    store. A new snapshot (info plus annual income statement and balance
+    sheet) is only fetched when the latest one is older than ttl, limiter
+    (a TokenBucket) is acquired before going to the network. With offline
+    set a missing snapshot raises instead of fetching.
+    """
+    snap = fundamentals.latest(ticker, cache_dir)
+    if not fundamentals.is_fresh(snap, ttl):
+        if offline:
+            if snap is None:
+                raise FileNotFoundError(f"No fundamentals stored for {ticker}")
+        else:
+            if limiter is not None:
+                limiter.acquire()
+            stock = yf.Ticker(ticker)
+            info = stock.info
+            try:
+                financials = stock.get_financials(freq='yearly')
+            except Exception:
+                financials = None
+            try:
+                balance_sheet = stock.get_balance_sheet(freq='yearly')
+            except Exception:
+                balance_sheet = None
+            snap = fundamentals.write(ticker, info, financials, balance_sheet, cache_dir)
+
+    return fundamentals.year_over_year(ticker, snap, cache_dir)
+
+
+# --- Scoring Kernel ---
+
+@dataclass
+class Rating:
+    sector: str
+    growth: float
+    valuation: float
+    financial: float
+    market: float
+    risk: float
+    total: float
+    details: dict = field(default_factory=dict)
+
+
+def weighted_total(growth, valuation, financial, market, risk, weights=weights):
+    return round(
+        growth * weights["growth"] +
+        valuation * weights["valuation"] +
+        financial * weights["financial"] +
+        market * weights["market"] +
+        risk * weights["risk"],
+        1
+    )
+
+
+def score_info(info, prev_info=None, weights=weights, adjustments=sector_adjustments):
+    """Score one ticker from its pre-fetched info dict, no network access."""
+    sector = _get(info, "sector", "Unknown Sector")
+    adj = adjustments.get(sector, default_adjustment)
+
+    growth_score, growth_details = score_profitability(info)
+    valuation_score, valuation_details = score_valuation(info, adj)
+    financial_score, financial_details = score_financial_strength(info, adj, prev_info)
+    market_position_score, market_details = score_market_position(info)
+    risk_score, risk_details = score_risk_volatility(info, adj)
+
+    return Rating(
+        sector=sector,
+        growth=growth_score,
+        valuation=valuation_score,
+        financial=financial_score,
+        market=market_position_score,
+        risk=risk_score,
+        total=weighted_total(growth_score, valuation_score, financial_score,
+                             market_position_score, risk_score, weights),
+        details={
+            "growth": growth_details,
+            "valuation": valuation_details,
+            "financial": financial_details,
+            "market": market_details,
+            "risk": risk_details,
+        },
+    )
+
+
+def _buckets(x, edges, points, strict=True):
+    """Points for the first edge x is above (>= if not strict), points[-1] otherwise."""
+    out = np.full(len(x), float(points[-1]))
+    done = np.zeros(len(x), dtype=bool)
+    for edge, p in zip(edges, points):
+        hit = ~done & ((x > edge) if strict else (x >= edge))
+        out[hit] = p
+        done |= hit
+    return out
+
+
+def score_frame(info_df, prev_df=None, weights=weights, adjustments=sector_adjustments):
+    """
+    Vectorized score_info() for many tickers at once. info_df has one row
+    per ticker and the info keys as columns, prev_df the previous year's
+    values with the same index (or None). Returns the component scores,
+    the Piotroski score and the total per ticker.
+    """
+    n = len(info_df)
+
+    def raw(df, key):
+        if df is None or key not in df.columns:
+            return np.full(n, np.nan)
+        return pd.to_numeric(df[key], errors="coerce").to_numpy(dtype=float)
+
+    def col(key, default, df=info_df):
+        x = raw(df, key)
+        return np.where(np.isnan(x), default, x)
+
+    def truthy(x):
+        return ~np.isnan(x) & (x != 0)
+
+    if "sector" in info_df.columns:
+        sector = info_df["sector"].where(info_df["sector"].notna(), "Unknown Sector")
+    else:
+        sector = pd.Series("Unknown Sector", index=info_df.index)
+    adj = pd.DataFrame([adjustments.get(sec, default_adjustment) for sec in sector])
+    pe_factor = adj["pe_factor"].to_numpy(dtype=float)
+    debt_factor = adj["debt_factor"].to_numpy(dtype=float)
+    beta_factor = adj["beta_factor"].to_numpy(dtype=float)
+
+    # --- Profitability ---
+    total_revenue = raw(info_df, "totalRevenue")
+    gross_profit_margin = np.where(truthy(total_revenue),
+                                   col("grossProfits", 0) / np.where(truthy(total_revenue), total_revenue, 1) * 100, 0)
+    growth = np.minimum(7, col("revenueGrowth", 0) * 100 / 3 + col("profitMargins", 0) * 100 / 3 +
+                        col("returnOnEquity", 0) * 100 / 10 + gross_profit_margin / 10 +
+                        col("operatingMargins", 0) * 100 / 10)
+
+    # --- Valuation ---
+    eps = col("trailingEps", 0)
+    eps_term = np.where(eps != 0, 5 / np.where(eps != 0, eps, 1), 0)
+    valuation = np.maximum(4, 10 - (col("trailingPE", 100) * pe_factor / 20 +
+                                    col("priceToSalesTrailing12Months", 10) / 10 +
+                                    col("priceToBook", 10) / 15 + eps_term +
+                                    col("forwardPE", 100) * pe_factor / 20 +
+                                    col("pegRatio", 1) / 10))
+
+    # --- Financial strength ---
+    total_liab = col("totalLiab", 0)
+    total_debt = col("totalDebt", np.nan)
+    total_debt = np.where(np.isnan(total_debt), total_liab, total_debt)
+    score = 10 - np.minimum(col("debtToEquity", 100) * debt_factor / 20, 3)
+    score += np.minimum((col("quickRatio", 1) - 1) * 2, 2)
+    score += np.minimum((col("currentRatio", 1) - 1.5) * 2, 2)
+
+    has = truthy(total_debt)
+    cash_flow_to_debt = col("operatingCashflow", 0) / np.where(has, total_debt, 1)
+    score += np.where(has, _buckets(cash_flow_to_debt, [1.5, 1, 0.5], [2, 1, -1, -2], strict=False), 0)
+
+    total_assets = col("totalAssets", 0)
+    has = (total_assets != 0) & (total_liab != 0)
+    ta = np.where(has, total_assets, 1)
+    z = (1.2 * (col("totalCurrentAssets", 0) - col("totalCurrentLiabilities", 0)) / ta +
+         1.4 * col("retainedEarnings", 0) / ta + 3.3 * col("ebit", 0) / ta +
+         0.6 * col("marketCap", 0) / np.where(has, total_liab, 1) + 1.0 * col("totalRevenue", 0) / ta)
+    score += np.where(has, _buckets(z, [2.99, 1.81], [1, 0, -2]), 0)
+
+    interest_expense = raw(info_df, "interestExpense")
+    has = truthy(interest_expense)
+    coverage = col("ebit", 0) / np.where(has, np.abs(interest_expense), 1)
+    score += np.where(has, _buckets(coverage, [3, 1.5, 1], [1, 0, -1, -2]), 0)
+
+    debt = raw(info_df, "totalDebt")
+    equity = raw(info_df, "totalStockholderEquity")
+    has = ~np.isnan(debt) & ~np.isnan(equity) & (debt + equity != 0)
+    debt_to_capital = debt / np.where(has, debt + equity, 1)
+    score += np.where(has, -_buckets(-debt_to_capital, [-0.4, -0.6, -0.8], [-1, 0, 1, 2]), 0)
+
+    piotroski = piotroski_frame(info_df, prev_df, col, raw)
+    score += _buckets(piotroski, [7, 5, 3], [2, 1, -1, -2], strict=False)
+    financial = np.maximum(1, np.minimum(10, score))
+
+    # --- Market position ---
+    market_cap = raw(info_df, "marketCap")
+    market = 5 + np.where(truthy(market_cap), _buckets(np.nan_to_num(market_cap), [100e9, 10e9], [3, 2, 1]), 0)
+    if "recommendationKey" in info_df.columns:
+        reco = info_df["recommendationKey"].map({"buy": 2, "strongBuy": 3, "underperform": -2, "sell": -3})
+        market += reco.fillna(0).to_numpy(dtype=float)
+    market = np.maximum(1, market)
+
+    # --- Risk ---
+    risk = np.maximum(5, 10 - col("beta", 1.2) * beta_factor * 4)
+
+    out = pd.DataFrame({
+        "sector": sector.to_numpy(),
+        "growth": growth,
+        "valuation": valuation,
+        "financial": financial,
+        "market": market,
+        "risk": risk,
+        "piotroski": piotroski.astype(int),
+    }, index=info_df.index)
+    out["total"] = [weighted_total(*r, weights=weights) for r in
+                    zip(growth, valuation, financial, market, risk)]
+    return out
+
+
+def piotroski_frame(info_df, prev_df, col, raw):
+    """Vectorized calculate_piotroski_f_score(), helpers come from score_frame()."""
+    n = len(info_df)
+    if prev_df is None:
+        has_prev = np.zeros(n, dtype=bool)
+    else:
+        prev_df = prev_df.reindex(info_df.index)
+        has_prev = prev_df.notna().any(axis=1).to_numpy()
+
+    def prev(key, default):
+        return col(key, default, prev_df) if prev_df is not None else np.full(n, default, dtype=float)
+
+    net_income = col("netIncomeToCommon", 0)
+    cashflow = col("operatingCashflow", 0)
+    assets = col("totalAssets", 1)
+    prev_assets = prev("totalAssets", 1)
+    ok = has_prev & (assets != 0) & (prev_assets != 0)
+    safe = np.where(assets != 0, assets, 1)
+    prev_safe = np.where(prev_assets != 0, prev_assets, 1)
+
+    score = (net_income > 0).astype(int)
+    score += cashflow > 0
+    score += ok & (net_income / safe > prev("netIncomeToCommon", 0) / prev_safe)
+    score += cashflow > net_income
+    score += ok & (col("longTermDebt", 0) / safe < prev("longTermDebt", 0) / prev_safe)
+    score += has_prev & (col("currentRatio", 0) > prev("currentRatio", 0))
+    score += has_prev & (col("sharesOutstanding", 0) <= prev("sharesOutstanding", 0))
+    score += has_prev & (col("grossMargins", 0) > prev("grossMargins", 0))
+    score += has_prev & (col("assetTurnover", 0) > prev("assetTurnover", 0))
+    return score
+
+
+def load_cached_universe(tickers, cache_dir=CACHE_DIR):
+    """
+    The stored info of the tickers as a DataFrame (one row per ticker) and
+    the previous year's values from the snapshot store. Nothing is fetched,
+    tickers without a snapshot are left out.
+    """
+    infos = {}
+    prevs = {}
+    for ticker in tickers:
+        try:
+            info, prev_info = fetch_fundamentals(ticker, cache_dir, ttl=float("inf"), offline=True)
+        except (FileNotFoundError, ValueError, KeyError):
+            continue
+        if not info:
+            continue
+        infos[ticker] = info
+        if prev_info:
+            prevs[ticker] = prev_info
+    info_df = pd.DataFrame.from_dict(infos, orient="index")
+    prev_df = pd.DataFrame.from_dict(prevs, orient="index") if prevs else None
+    return info_df, prev_df
+
 # --- Main Analysis Function ---
 
 def get_stock_rating(ticker):
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        # Try to get previous annual data for Piotroski F-Score trends
-        prev_info = None
-        try:
-            hist = stock.get_financials(freq='annual')
-            if hist is not None and len(hist.columns) > 1:
-                # Use the previous year's data if available
-                prev_info = {k: hist[k][1] for k in hist.index if len(hist[k]) > 1}
-        except Exception:
-            prev_info = None
+        info, prev_info = fetch_fundamentals(ticker)
 
         if not info:
             logging.warning(f"No information found for ticker: {ticker}")
             return f"Error: No information found for ticker {ticker}."
-        sector = info.get("sector", "Unknown Sector")
-        sector_adjustments = {
-            "Technology": {"pe_factor": 1.5, "debt_factor": 1.2, "beta_factor": 1.1},
-            "Financial Services": {"pe_factor": 0.8, "debt_factor": 0.7, "beta_factor": 1.2},
-            "Healthcare": {"pe_factor": 1.2, "debt_factor": 1.0, "beta_factor": 0.9},
-            "Consumer Defensive": {"pe_factor": 1.0, "debt_factor": 0.9, "beta_factor": 0.8},
-            "Consumer Cyclical": {"pe_factor": 1.3, "debt_factor": 1.1, "beta_factor": 1.3},
-            "Industrials": {"pe_factor": 1.1, "debt_factor": 1.0, "beta_factor": 1.0},
-            "Basic Materials": {"pe_factor": 0.9, "debt_factor": 1.3, "beta_factor": 1.1},
-            "Real Estate": {"pe_factor": 0.7, "debt_factor": 0.6, "beta_factor": 0.7},
-            "Utilities": {"pe_factor": 0.9, "debt_factor": 0.8, "beta_factor": 0.6},
-            "Energy": {"pe_factor": 0.7, "debt_factor": 1.3, "beta_factor": 1.3},
-            "Communication Services": {"pe_factor": 1.2, "debt_factor": 1.1, "beta_factor": 1.0}
-        }
-        adj = sector_adjustments.get(sector, {"pe_factor": 1.0, "debt_factor": 1.0, "beta_factor": 1.0})
-
-        # --- Scoring ---
-        growth_score, growth_details = score_profitability(info)
-        valuation_score, valuation_details = score_valuation(info, adj)
-        financial_score, financial_details = score_financial_strength(info, adj, prev_info)
-        market_position_score, market_details = score_market_position(info)
-        risk_score, risk_details = score_risk_volatility(info, adj)
-
-        # --- Weights ---
-        weights = {
-            "growth": 0.27,
-            "valuation": 0.18,
-            "financial": 0.28,  # increased to reflect its importance
-            "market": 0.18,
-            "risk": 0.09
-        }
-
-        final_score = round(
-            growth_score * weights["growth"] +
-            valuation_score * weights["valuation"] +
-            financial_score * weights["financial"] +
-            market_position_score * weights["market"] +
-            risk_score * weights["risk"],
-            1
-        )
+
+        rating = score_info(info, prev_info)
+        sector = rating.sector
+        growth_score, growth_details = rating.growth, rating.details["growth"]
+        valuation_score, valuation_details = rating.valuation, rating.details["valuation"]
+        financial_score, financial_details = rating.financial, rating.details["financial"]
+        market_position_score, market_details = rating.market, rating.details["market"]
+        risk_score, risk_details = rating.risk, rating.details["risk"]
+        final_score = rating.total
 
         currency = info.get("currency", "Unknown")
 
@@ -434,10 +699,69 @@ Total Rating: {final_score}/10
         logging.error(f"An error occurred while analyzing {ticker}: {e}")
         return f"Error: An error occurred while analyzing {ticker}: {e}"
 
+# --- Batch Runner ---
+
+def rate_universe(tickers, workers=4, rate=1.0, cache_dir=CACHE_DIR, ttl=CACHE_TTL):
+    """
+    Score every ticker, fetching fundamentals that are not cached on a pool
+    of workers with at most rate fetches per second. Returns a DataFrame of
+    the component and total scores sorted by total, tickers that could not
+    be fetched are kept with the error message.
+    """
+    bucket = download.TokenBucket(rate, workers)
+
+    def one(ticker):
+        try:
+            fetch_fundamentals(ticker, cache_dir, ttl, bucket)
+        except Exception as e:
+            logging.error(f"An error occurred while fetching {ticker}: {e}")
+            return str(e)
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        errors = dict(zip(tickers, pool.map(one, tickers)))
+
+    return rescore(tickers, cache_dir, errors=errors)
+
+
+def rescore(tickers, cache_dir=CACHE_DIR, weights=weights, adjustments=sector_adjustments, errors=None,
+            cached=None):
+    """
+    Score the cached universe again, e.g. after changing weights, without
+    fetching. Reading the snapshots is most of the time, pass the
+    (info_df, prev_df) of load_cached_universe() as cached to score
+    repeatedly in milliseconds:
+
+        cached = load_cached_universe(tickers)
+        table = rescore(tickers, weights=new_weights, cached=cached)
+    """
+    info_df, prev_df = cached if cached is not None else load_cached_universe(tickers, cache_dir)
+    columns = ["ticker", "name", "sector", "growth", "valuation", "financial",
+               "market", "risk", "piotroski", "total", "error"]
+    if info_df.empty:
+        # every fetch failed, still one row with the error per ticker
+        table = pd.DataFrame(columns=columns[1:-1], index=pd.Index([], name="ticker"))
+    else:
+        table = score_frame(info_df, prev_df, weights, adjustments)
+        table.insert(0, "name", info_df["shortName"] if "shortName" in info_df.columns else None)
+        table.index.name = "ticker"
+    table = table.reindex(pd.Index(list(tickers), name="ticker")).reset_index()
+    table["error"] = [(errors or {}).get(t) for t in table["ticker"]]
+    table.loc[table["total"].isna() & table["error"].isna(), "error"] = "No information found"
+    table = table.reindex(columns=columns)
+    return table.sort_values("total", ascending=False, na_position="last").reset_index(drop=True)
+
+
 # Example call
 if __name__ == "__main__":
-    #ticker = "RDNT" # Adjust ticker if needed
-    ticker = "COLO-B.CO" # Adjust ticker if needed
-    analysis = get_stock_rating(ticker)
-    print(analysis)
-
+    if len(sys.argv) > 1 and sys.argv[1] == "all":
+        # Score the whole list.txt universe, optionally save as csv
+        table = rate_universe(universe.yahoo_symbols())
+        if len(sys.argv) > 2:
+            table.to_csv(sys.argv[2], index=False)
+        print(table.to_string(index=False))
+    else:
+        #ticker = "RDNT" # Adjust ticker if needed
+        ticker = sys.argv[1] if len(sys.argv) > 1 else "COLO-B.CO" # Adjust ticker if needed
+        analysis = get_stock_rating(ticker)
+        print(analysis)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Indicator stage: slope series of many tickers on a process pool.
+
+Each task ships only the Adj Close and Volume arrays plus the stored
+slope arrays of one ticker to a worker, the worker returns the updated
+slope arrays. Results come back in the order the tickers were given,
+whatever the number of workers, so the written files do not depend on
+scheduling.
+
+    python -m stockutils.compute [--full] [--workers N] [--windows 60 120 360] [NAME ...]
+"""
+import os
+import sys
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from stockutils import store
+from stockutils import utils
+
+WINDOWS = [60, 120, 360]
+
+
+def task(name, d, since=None, full=False, windows=WINDOWS):
+    """The compact arrays a worker needs for one ticker of a dict of columns."""
+    old = {}
+    if not full:
+        for days in windows:
+            key = utils.slope_key(days)
+            if key in d:
+                old[key] = np.asarray(d[key], dtype=float)
+    return (name, np.asarray(d["Adj Close"], dtype=float), np.asarray(d["Volume"]),
+            old, since, windows)
+
+
+def slopes(t):
+    """Worker: (name, {key: slope array}) for one task."""
+    name, price, volume, old, since, windows = t
+    prev = {days: old.get(utils.slope_key(days), np.empty(0)) for days in windows}
+    out = {}
+    for days, (new, keep) in utils.update_slopes(price, volume, prev, since).items():
+        out[utils.slope_key(days)] = np.concatenate((prev[days][:keep], new))
+    return name, out
+
+
+def executor(workers=None):
+    """
+    Process pool for slopes(), None when workers is 1 and the work should
+    run in this process. workers=None uses one worker per core. The workers
+    are started before this returns, so create the pool before starting
+    any threads.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return None
+    # fork where we can: the scripts calling this have no __main__ guard and
+    # spawned workers would re-run them on import
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork") if "fork" in methods else None
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    # the first task forks all workers, do it now and not once the caller
+    # has threads that may hold a lock at the time of the fork
+    pool.submit(int).result()
+    return pool
+
+
+def update(tasks, workers=None, chunksize=4):
+    """Yield (name, slopes) for the tasks, in task order."""
+    pool = executor(workers)
+    if pool is None:
+        yield from map(slopes, tasks)
+        return
+    with pool:
+        yield from pool.map(slopes, tasks, chunksize=chunksize)
+
+
+def _read(name, directory):
+    if store.exists(name, directory):
+        return {col: np.array(arr) for col, arr in store.load(name, directory=directory).items()}
+    return utils.rd_d(os.path.join(directory, name + ".json"))
+
+
+def sweep(names, windows, workers=None, directory=store.DIRECTORY):
+    """
+    Yield (name, {SlopeN: array}) for every window length in windows,
+    computed from scratch and not written, e.g. range(20, 501) to tune
+    the signal window over the universe.
+    """
+    tasks = []
+    for name in names:
+        d = _read(name, directory)
+        if d and "Volume" in d:
+            tasks.append(task(name, d, full=True, windows=list(windows)))
+    yield from update(tasks, workers)
+
+
+def run(names, full=False, workers=None, windows=WINDOWS, directory=store.DIRECTORY):
+    """
+    Bring the slopes of stored tickers up to date (recompute them all with
+    full) and write them back. Returns the names that were written.
+    """
+    data = {}
+    for name in names:
+        d = _read(name, directory)
+        if d and "Volume" in d:
+            data[name] = d
+
+    written = []
+    for name, out in update([task(name, d, full=full, windows=windows) for name, d in data.items()], workers):
+        d = data.pop(name)
+        d.update(out)
+        store.save(name, d, directory)
+        written.append(name)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute slope series for stored tickers.")
+    parser.add_argument("names", nargs="*", help="SYM.KEY names, default all stored")
+    parser.add_argument("--full", action="store_true", help="recompute everything")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--windows", type=int, nargs="+", default=WINDOWS,
+                        help="window lengths, written as Slope<N>")
+    args = parser.parse_args(sys.argv[1:])
+    done = run(args.names or store.names(), args.full, args.workers, args.windows)
+    print(f"{len(done)} tickers updated")
@@ -0,0 +1,170 @@
+import time
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import pandas as pd
+
+
+class TokenBucket:
+    """
+    Simple thread safe token bucket, acquire() blocks until a token is free.
+    rate is tokens per second, capacity is the largest burst allowed.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+
+def yf_download(tickers, start, end, acquire=None):
+    """
+    Download the tickers one after the other like yf.download(threads=False)
+    does and return (frame, errors). acquire() is called before every
+    request. The frame has the yf.download group_by="ticker" layout with
+    every ticker in it, errors maps the tickers whose download failed to
+    the exception. Yahoo answering that there is no data in the range is
+    not an error, the ticker is just empty. yf.download only logs its per
+    ticker errors, so it can't tell the two apart for us.
+
+    Turns off yfinance's hide_exceptions for the whole process, the other
+    yfinance calls here catch their exceptions themselves.
+    """
+    import yfinance as yf
+    from yfinance.exceptions import YFPricesMissingError, YFTzMissingError
+
+    yf.config.debug.hide_exceptions = False
+    frames = {}
+    errors = {}
+    for sym in tickers:
+        if acquire is not None:
+            acquire()
+        try:
+            df = yf.Ticker(sym).history(start=start, end=end, auto_adjust=False, actions=False)
+            df.index = df.index.tz_localize(None)
+        except (YFPricesMissingError, YFTzMissingError):
+            df = pd.DataFrame(columns=COLUMNS)
+        except Exception as e:
+            errors[sym] = e
+            df = pd.DataFrame(columns=COLUMNS)
+        frames[sym] = df.reindex(columns=COLUMNS)
+    return pd.concat(frames, axis=1), errors
+
+
+def make_batches(requests, batch_size=20):
+    """
+    Group (symbol, start) requests sharing a start date into batches of at
+    most batch_size symbols. Returns a list of (start, [symbols]).
+    """
+    groups = {}
+    for sym, start in requests:
+        groups.setdefault(start, []).append(sym)
+
+    batches = []
+    for start, syms in groups.items():
+        for i in range(0, len(syms), batch_size):
+            batches.append((start, syms[i:i+batch_size]))
+    return batches
+
+
+def split_batch(df, tickers):
+    """
+    Split the result of a multi symbol download into one frame per symbol.
+    Rows where a symbol has no data (other exchange holidays) are dropped.
+    Symbols that are not in the frame at all are left out of the result.
+    """
+    out = {}
+    if df is None or not len(df.columns):
+        return out
+    for sym in tickers:
+        if isinstance(df.columns, pd.MultiIndex):
+            if sym in df.columns.get_level_values(0):
+                sdf = df[sym]
+            elif sym in df.columns.get_level_values(1):
+                sdf = df.xs(sym, axis=1, level=1)
+            else:
+                continue
+        else:
+            sdf = df
+        sdf = sdf.dropna(how="all")
+        sdf.index.name = "Date"
+        sdf.columns.name = None
+        out[sym] = sdf
+    return out
+
+
+def fetch(requests, end=None, download=yf_download, batch_size=20, workers=4,
+          rate=4.0, burst=8, retries=3, backoff=2.0, pending=None):
+    """
+    Download daily bars for (symbol, start) requests.
+
+    Symbols with the same start date go into one multi symbol call, batches
+    run on a pool of workers and every request takes a token from a shared
+    bucket so Yahoo is not hit faster than rate requests per second. Failed
+    symbols are retried with exponential backoff, only those of a batch.
+
+    download(tickers, start, end, acquire) must call acquire() before every
+    request it sends and return a frame like yf.download with
+    group_by="ticker", or (frame, errors) like yf_download, so a local fake
+    can be passed in for offline runs. A symbol fails when the call raises,
+    when it is in errors or when it is missing from the frame. A symbol in
+    the frame without rows is Yahoo's answer that there are no new bars.
+
+    Yields (symbol, DataFrame) as batches complete, an empty frame means no
+    data. With pending set at most that many batches are submitted ahead of
+    the consumer, so a slow consumer holds back the downloads.
+    """
+    bucket = TokenBucket(rate, burst)
+
+    def run(start, tickers):
+        out = {}
+        for attempt in range(retries + 1):
+            try:
+                result = download(tickers, start, end, bucket.acquire)
+                df, errors = result if isinstance(result, tuple) else (result, {})
+                frames = split_batch(df, tickers)
+            except Exception as e:
+                frames, errors = {}, {sym: e for sym in tickers}
+            out.update((sym, sdf) for sym, sdf in frames.items() if sym not in errors)
+            failed = [sym for sym in tickers if sym not in out]
+            if not failed:
+                return out
+            if attempt == retries:
+                for sym in failed:
+                    print(f"Download failed for {sym}: {errors.get(sym, 'no data returned')}")
+                    out[sym] = pd.DataFrame()
+                return out
+            tickers = failed
+            time.sleep(backoff * 2 ** attempt)
+
+    batches = make_batches(requests, batch_size)
+    if pending is None:
+        pending = len(batches)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        queued = iter(batches)
+        futures = {pool.submit(run, start, tickers) for start, tickers in itertools.islice(queued, pending)}
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for fut in done:
+                for sym, df in fut.result().items():
+                    yield sym, df
+                for start, tickers in itertools.islice(queued, 1):
+                    futures.add(pool.submit(run, start, tickers))
@@ -0,0 +1,175 @@
+"""
+Fundamentals snapshot store.
+
+Every fetch of a ticker's fundamentals is kept as yfinfo/<TICKER>/<date>.json
+with the raw info dict and the annual income statement and balance sheet,
+so year over year inputs can come from our own history even after Yahoo
+stops returning older statements.
+
+The Piotroski/Altman inputs that info does not carry (total assets,
+current assets, retained earnings, ...) are filled from the statements.
+"""
+import io
+import os
+import json
+import glob
+import time
+from datetime import date, datetime
+
+import pandas as pd
+
+DIRECTORY = "yfinfo"
+YEAR = 330  # days, a snapshot at least this much older counts as last year
+
+# Annual statement rows -> info keys
+STATEMENT_FIELDS = {
+    "Net Income Common Stockholders": "netIncomeToCommon",
+    "Total Revenue": "totalRevenue",
+    "Gross Profit": "grossProfits",
+    "EBIT": "ebit",
+    "Interest Expense": "interestExpense",
+    "Total Assets": "totalAssets",
+    "Current Assets": "totalCurrentAssets",
+    "Current Liabilities": "totalCurrentLiabilities",
+    "Retained Earnings": "retainedEarnings",
+    "Total Liabilities Net Minority Interest": "totalLiab",
+    "Long Term Debt": "longTermDebt",
+    "Stockholders Equity": "totalStockholderEquity",
+    "Ordinary Shares Number": "sharesOutstanding",
+}
+
+
+def _dir(ticker, directory):
+    return os.path.join(directory, ticker)
+
+
+def _frame_to_json(df):
+    return df.to_json(orient="split", date_format="iso") if df is not None else None
+
+
+def _frame_from_json(s):
+    return pd.read_json(io.StringIO(s), orient="split") if s else None
+
+
+def snapshot_dates(ticker, directory=DIRECTORY):
+    files = glob.glob(os.path.join(_dir(ticker, directory), "*.json"))
+    return sorted(os.path.basename(f)[:-len(".json")] for f in files)
+
+
+def read(ticker, day, directory=DIRECTORY):
+    with open(os.path.join(_dir(ticker, directory), day + ".json"), 'r') as f:
+        snap = json.load(f)
+    snap["date"] = day
+    snap["financials"] = _frame_from_json(snap.get("financials"))
+    snap["balance_sheet"] = _frame_from_json(snap.get("balance_sheet"))
+    return snap
+
+
+def write(ticker, info, financials=None, balance_sheet=None, directory=DIRECTORY):
+    """Store a snapshot for today, replacing an earlier one from the same day."""
+    p = _dir(ticker, directory)
+    os.makedirs(p, exist_ok=True)
+    day = date.today().isoformat()
+    snap = {
+        "fetched": time.time(),
+        "info": info,
+        "financials": _frame_to_json(financials),
+        "balance_sheet": _frame_to_json(balance_sheet),
+    }
+    f = os.path.join(p, day + ".json")
+    with open(f + ".tmp", 'w') as fh:
+        json.dump(snap, fh, default=str)
+    os.replace(f + ".tmp", f)
+    return read(ticker, day, directory)
+
+
+def _migrate_legacy(ticker, directory):
+    """Move a yfinfo/<TICKER>.json single cache file into the snapshot layout."""
+    legacy = os.path.join(directory, f"{ticker}.json")
+    if not os.path.exists(legacy):
+        return
+    try:
+        with open(legacy, 'r') as f:
+            cached = json.load(f)
+        day = datetime.fromtimestamp(cached["fetched"]).date().isoformat()
+        os.makedirs(_dir(ticker, directory), exist_ok=True)
+        os.replace(legacy, os.path.join(_dir(ticker, directory), day + ".json"))
+    except (ValueError, KeyError):
+        os.remove(legacy)
+
+
+def latest(ticker, directory=DIRECTORY):
+    _migrate_legacy(ticker, directory)
+    dates = snapshot_dates(ticker, directory)
+    return read(ticker, dates[-1], directory) if dates else None
+
+
+def is_fresh(snap, ttl):
+    return snap is not None and time.time() - snap["fetched"] < ttl
+
+
+def statement_info(snap, column=0):
+    """
+    Info keys taken from column (0 = latest year) of the annual statements
+    of a snapshot, plus the ratios Piotroski compares year over year.
+    """
+    out = {}
+    for df in (snap.get("financials"), snap.get("balance_sheet")):
+        if df is None or df.empty or len(df.columns) <= column:
+            continue
+        values = df.iloc[:, column]
+        for row, key in STATEMENT_FIELDS.items():
+            if row in values.index and pd.notna(values[row]):
+                out[key] = float(values[row])
+    if out.get("totalRevenue"):
+        if "grossProfits" in out:
+            out["grossMargins"] = out["grossProfits"] / out["totalRevenue"]
+        if out.get("totalAssets"):
+            out["assetTurnover"] = out["totalRevenue"] / out["totalAssets"]
+    if out.get("totalCurrentLiabilities") and "totalCurrentAssets" in out:
+        out["currentRatio"] = out["totalCurrentAssets"] / out["totalCurrentLiabilities"]
+    return out
+
+
+def current_info(snap):
+    """The info dict of a snapshot with missing inputs filled from the latest statements."""
+    info = dict(snap.get("info") or {})
+    if not info:
+        return info
+    for key, value in statement_info(snap, 0).items():
+        if info.get(key) is None:
+            info[key] = value
+    return info
+
+
+# Info keys Piotroski compares with last year
+PIOTROSKI_FIELDS = ["netIncomeToCommon", "totalAssets", "longTermDebt", "currentRatio",
+                    "sharesOutstanding", "grossMargins", "assetTurnover"]
+
+
+def year_over_year(ticker, snap, directory=DIRECTORY):
+    """
+    (info, last year's info) for snap. Last year is the newest stored
+    snapshot at least a year older than snap. Without one it is the
+    previous year's column of snap's statements, and the Piotroski inputs
+    of info then come from the latest column, so both years are annual
+    figures from the same statements and not live or TTM values from info.
+    """
+    info = current_info(snap)
+    if not info:
+        return info, None
+    day = datetime.strptime(snap["date"], "%Y-%m-%d").date()
+    for d in reversed(snapshot_dates(ticker, directory)):
+        if (day - datetime.strptime(d, "%Y-%m-%d").date()).days >= YEAR:
+            old = current_info(read(ticker, d, directory))
+            if old:
+                return info, old
+            break
+    prev = statement_info(snap, 1)
+    if not prev:
+        return info, None
+    latest = statement_info(snap, 0)
+    for key in PIOTROSKI_FIELDS:
+        if key in latest:
+            info[key] = latest[key]
+    return info, prev
@@ -0,0 +1,126 @@
+"""
+Incremental news harvester.
+
+News items are kept append-only in yfnews/<SYM>_news.jsonl, one item per
+line in the order they were first seen. Which ids are already stored is
+kept in the SQLite index yfnews/index.db, which also holds the
+full-text index of the items and is caught up from the archives before
+every harvest (see newsindex), so a refresh only looks up the
+fetched ids and appends the new lines, the cost follows the number of
+new items and not the size of the archive. Symbols are fetched on a
+thread pool behind a token bucket, writes happen on the calling thread.
+"""
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from stockutils import newsindex
+from stockutils.download import TokenBucket
+
+DIRECTORY = newsindex.DIRECTORY
+
+
+def yf_news(symbol):
+    import yfinance as yf
+    return yf.Ticker(symbol).news or []
+
+
+def path(symbol, directory=DIRECTORY):
+    return os.path.join(directory, f"{symbol}_news.jsonl")
+
+
+def _legacy_path(symbol, directory):
+    return os.path.join(directory, f"{symbol}_news.json")
+
+
+def connect(directory=DIRECTORY):
+    return newsindex.connect(directory)
+
+
+def _append(con, symbol, items, directory):
+    """Append the items whose id is not indexed yet, returns the new ones."""
+    new = []
+    seen = set()
+    for item in items:
+        if item.get('id') is None or item['id'] in seen:
+            continue
+        seen.add(item['id'])
+        if con.execute('SELECT 1 FROM ids WHERE symbol = ? AND id = ?', (symbol, item['id'])).fetchone() is None:
+            new.append(item)
+    if new:
+        p = path(symbol, directory)
+        with open(p, 'a') as f:
+            for item in new:
+                f.write(json.dumps(item) + "\n")
+        newsindex.add(con, symbol, new, os.path.getsize(p))
+    con.commit()
+    return new
+
+
+def migrate(con, symbol, directory=DIRECTORY):
+    """Move a legacy <SYM>_news.json (newest first) into the jsonl archive."""
+    legacy = _legacy_path(symbol, directory)
+    if not os.path.exists(legacy):
+        return 0
+    try:
+        with open(legacy, 'r') as f:
+            items = json.load(f)
+    except ValueError:
+        items = []
+    n = len(_append(con, symbol, list(reversed(items)), directory))
+    os.remove(legacy)
+    return n
+
+
+def harvest(symbols, fetch=yf_news, directory=DIRECTORY, workers=4, rate=2.0, burst=4, on_new=None):
+    """
+    Fetch news for symbols and store the unseen items. Yields
+    (symbol, new_count) as symbols complete, a failed fetch counts as 0.
+    on_new(symbol, items) is called with the stored items of each symbol.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    bucket = TokenBucket(rate, burst)
+
+    def one(symbol):
+        bucket.acquire()
+        return fetch(symbol)
+
+    con = connect(directory)
+    try:
+        # ids and full-text rows of archive lines the index is missing
+        newsindex.update(con, directory)
+        con.commit()
+        for symbol in symbols:
+            migrate(con, symbol, directory)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(one, s): s for s in symbols}
+            for fut in as_completed(futures):
+                symbol = futures[fut]
+                try:
+                    items = fut.result()
+                except Exception:
+                    yield symbol, 0
+                    continue
+                # yahoo lists newest first, the archive is in arrival order
+                new = _append(con, symbol, list(reversed(items)), directory)
+                if new and on_new is not None:
+                    on_new(symbol, new)
+                yield symbol, len(new)
+    finally:
+        con.close()
+
+
+def load(symbol, directory=DIRECTORY):
+    """Stored news for symbol, newest first."""
+    items = []
+    p = path(symbol, directory)
+    if os.path.exists(p):
+        with open(p, 'r') as f:
+            items = [json.loads(line) for line in f if line.strip()]
+    else:
+        legacy = _legacy_path(symbol, directory)
+        if os.path.exists(legacy):
+            with open(legacy, 'r') as f:
+                return json.load(f)
+    items.reverse()
+    return items
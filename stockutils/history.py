@@ -0,0 +1,107 @@
+"""
+Read-through cache of daily bars shared by the dashboard and analyse.py.
+
+Bars are served from the price store in yfdata/. Only the tail after the
+last stored day up to yesterday is downloaded (at most once per symbol
+and day in one process), like the refresh in analyse.py does, so no
+half finished bar of today is stored. A start before the first stored
+bar downloads the missing head once. The merged series and their slopes
+(the compute.WINDOWS columns) are written back to the store, under the
+store lock so a refresh running in analyse.py at the same time keeps its
+manifest entries.
+"""
+import os
+from datetime import date
+
+import pandas as pd
+
+from stockutils import store
+from stockutils import utils
+from stockutils import compute
+from stockutils import download
+from stockutils import universe
+from stockutils import tradingcal
+
+BEGIN = "2021-01-01"  # first day of a ticker's history, analyse.py starts there too
+
+_checked = {}
+_backfilled = {}
+
+
+def store_name(yahoo_symbol):
+    """SYM.KEY name of the store entry for a Yahoo symbol."""
+    if os.path.exists(universe.LIST):
+        t = universe.load()["tickers"].get(yahoo_symbol)
+        if t:
+            return t["name"]
+    return yahoo_symbol if "." in yahoo_symbol else yahoo_symbol + ".US"
+
+
+def _download(yahoo_symbol, start, end, fetch_fn):
+    df = dict(download.fetch([(yahoo_symbol, start)], end=end, download=fetch_fn)).get(yahoo_symbol)
+    return df if df is not None and not df.empty else None
+
+
+def _refresh(yahoo_symbol, name, d, fetch_fn, start=None):
+    today = date.today()
+    frames = []
+
+    # history before the first stored bar, once per start and process
+    first = d["Date"][0] if d else None
+    if start is not None and first is not None and start < first and _backfilled.get(name, first) > start:
+        frames.append(_download(yahoo_symbol, start, first, fetch_fn))
+        _backfilled[name] = start
+
+    # the tail up to yesterday, today's bar is still moving and the
+    # refresh in analyse.py would never replace it
+    if _checked.get(name) != today:
+        _checked[name] = today
+        expected = tradingcal.last_session(tradingcal.exchange_of(name), today).isoformat()
+        if not d or d["Date"][-1] < expected:
+            begin = d["Date"][-1] if d else min(start or BEGIN, BEGIN)
+            frames.append(_download(yahoo_symbol, begin, today.isoformat(), fetch_fn))
+
+    frames = [df for df in frames if df is not None]
+    if not frames:
+        return d
+    since = None
+    for df in frames:
+        d, s = utils.merge_yf2d(df, d)
+        if s is not None:
+            since = s if since is None else min(since, s)
+    if "Volume" in d:
+        utils.analyse_windows(name, compute.WINDOWS, d, since)
+    store.save(name, d)
+    return d
+
+
+def daily(yahoo_symbol, start=None, fetch_fn=download.yf_download, refresh=True):
+    """
+    Daily bars from start as a DataFrame indexed by date with the stored
+    price columns (Open, High, Low, Close, Adj Close, Volume).
+    """
+    name = store_name(yahoo_symbol)
+    d = utils.rd_d(os.path.join(store.DIRECTORY, name + ".json"))
+    if refresh:
+        first = pd.Timestamp(start).strftime("%Y-%m-%d") if start is not None else None
+        d = _refresh(yahoo_symbol, name, d, fetch_fn, first)
+    if not d:
+        return pd.DataFrame()
+
+    n = len(d["Date"])
+    cols = {k: v for k, v in d.items() if k != "Date" and len(v) == n}
+    df = pd.DataFrame(cols, index=pd.DatetimeIndex(pd.to_datetime(d["Date"]), name="Date"))
+    if start is not None:
+        df = df[df.index >= pd.Timestamp(start).normalize()]
+    return df
+
+
+def weekly(yahoo_symbol, start=None, **kw):
+    """Weekly bars resampled from daily() like yfinance 1wk, weeks labelled by their Monday."""
+    df = daily(yahoo_symbol, start, **kw)
+    if df.empty:
+        return df
+    agg = {"Open": "first", "High": "max", "Low": "min", "Close": "last",
+           "Adj Close": "last", "Volume": "sum"}
+    agg = {k: v for k, v in agg.items() if k in df.columns}
+    return df.resample("W-MON", label="left", closed="left").agg(agg).dropna(how="all")
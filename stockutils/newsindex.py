@@ -0,0 +1,131 @@
+"""
+Full-text search over the harvested news.
+
+Title and summary of every stored item are kept in an SQLite FTS5 table
+in yfnews/index.db next to the harvester's id index, add() fills both in
+one transaction. How far each archive is indexed is kept as a byte
+offset, so update() picks up archives written before the index existed,
+or lines whose commit was lost, without rereading the rest. A deleted
+index.db is rebuilt from the archives, ids included.
+"""
+import os
+import glob
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+DIRECTORY = "yfnews"
+INDEX = "index.db"
+
+
+def connect(directory=DIRECTORY):
+    os.makedirs(directory, exist_ok=True)
+    con = sqlite3.connect(os.path.join(directory, INDEX))
+    con.execute('CREATE VIRTUAL TABLE IF NOT EXISTS news USING fts5('
+                'title, summary, symbol UNINDEXED, id UNINDEXED, published UNINDEXED)')
+    con.execute('CREATE TABLE IF NOT EXISTS indexed (symbol TEXT PRIMARY KEY, offset INTEGER)')
+    con.execute('CREATE TABLE IF NOT EXISTS ids (symbol TEXT, id TEXT, PRIMARY KEY (symbol, id))')
+    return con
+
+
+def fields(item):
+    """(title, summary, published) of a news item, old and new yfinance layouts."""
+    content = item.get('content') or {}
+    title = content.get('title') or item.get('title') or ""
+    summary = content.get('summary') or content.get('description') or item.get('summary') or ""
+    published = content.get('pubDate') or ""
+    if not published and item.get('providerPublishTime'):
+        t = datetime.fromtimestamp(item['providerPublishTime'], tz=timezone.utc)
+        published = t.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return title, summary, published
+
+
+def add(con, symbol, items, offset):
+    """
+    Index items stored for symbol and record their ids, offset is the
+    archive size once they are written. The caller commits.
+    """
+    rows = []
+    for item in items:
+        title, summary, published = fields(item)
+        rows.append((title, summary, symbol, item['id'], published))
+    con.executemany('INSERT INTO news VALUES (?, ?, ?, ?, ?)', rows)
+    con.executemany('INSERT OR IGNORE INTO ids VALUES (?, ?)', [(symbol, row[3]) for row in rows])
+    con.execute('INSERT OR REPLACE INTO indexed VALUES (?, ?)', (symbol, offset))
+
+
+def update(con, directory=DIRECTORY):
+    """
+    Index whatever the archives hold past their indexed offset, e.g. news
+    harvested before the index existed. Only archives that grew are read.
+    Returns the number of items added, the caller commits.
+    """
+    done = dict(con.execute('SELECT symbol, offset FROM indexed'))
+    added = 0
+    for p in glob.glob(os.path.join(directory, "*_news.jsonl")):
+        symbol = os.path.basename(p)[:-len("_news.jsonl")]
+        offset = done.get(symbol, 0)
+        if os.path.getsize(p) <= offset:
+            continue
+        with open(p, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        items = [json.loads(line) for line in data.decode("utf-8").splitlines() if line.strip()]
+        add(con, symbol, items, offset + len(data))
+        added += len(items)
+    return added
+
+
+def rebuild(directory=DIRECTORY):
+    con = connect(directory)
+    try:
+        added = update(con, directory)
+        con.commit()
+        return added
+    finally:
+        con.close()
+
+
+def phrase(text):
+    """FTS5 query matching text as one phrase, e.g. rights issue."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def search(query, symbols=None, start=None, end=None, limit=50, directory=DIRECTORY):
+    """
+    Items matching the FTS5 query, best match first, as a list of dicts
+    with symbol, id, title, summary and published. symbols restricts the
+    tickers, start/end (YYYY-MM-DD, inclusive) the publish date.
+    """
+    sql = 'SELECT symbol, id, title, summary, published FROM news WHERE news MATCH ?'
+    args = [query]
+    if symbols:
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        sql += f' AND symbol IN ({", ".join("?" * len(symbols))})'
+        args += symbols
+    if start:
+        sql += ' AND substr(published, 1, 10) >= ?'
+        args.append(start)
+    if end:
+        sql += ' AND substr(published, 1, 10) <= ?'
+        args.append(end)
+    sql += ' ORDER BY rank LIMIT ?'
+    args.append(limit)
+
+    con = connect(directory)
+    try:
+        rows = con.execute(sql, args).fetchall()
+    finally:
+        con.close()
+    keys = ("symbol", "id", "title", "summary", "published")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+if __name__ == "__main__":
+    # python -m stockutils.newsindex "rights issue" [SYM ...]
+    import sys
+    if len(sys.argv) < 2:
+        print(f"{rebuild()} items indexed")
+    else:
+        for hit in search(phrase(sys.argv[1]), sys.argv[2:] or None):
+            print(f"{hit['published'][:10]}  {hit['symbol']:<12} {hit['title']}")
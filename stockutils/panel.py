@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Single file price panel for all tickers.
+
+yfdata/panel.npy holds a float64 array of shape (fields, tickers, dates),
+so one field for every ticker is one contiguous block and one ticker's
+series inside it is contiguous too. yfdata/panel.json maps field names and
+SYM.EXCHANGE names to their offsets and gives the first date of the date
+axis, the dates themselves are in yfdata/panel_dates.npy.
+
+The panel is opened memory-mapped, ranking all tickers on one field only
+reads the pages of that field. Series shorter than Date (the slopes) are
+aligned on their last row, i.e. a value sits on the date its window ends.
+"""
+import os
+import sys
+import json
+
+import numpy as np
+
+from stockutils import store
+
+DIRECTORY = store.DIRECTORY
+PANEL = "panel.npy"
+DATES = "panel_dates.npy"
+INDEX = "panel.json"
+FIELDS = ["Adj Close", "Close", "High", "Low", "Open", "Volume",
+          "Slope60", "Slope120", "Slope360"]
+
+
+def _load_ticker(name, directory):
+    if store.exists(name, directory):
+        return store.load(name, directory=directory)
+    from stockutils import utils
+    d = utils.rd_d(os.path.join(directory, name + ".json"))
+    if not d:
+        return {}
+    return {col: np.asarray(v, dtype="datetime64[D]" if col == "Date" else float)
+            for col, v in d.items()}
+
+
+def build(names, fields=FIELDS, directory=DIRECTORY):
+    """Build the panel for the SYM.EXCHANGE names from the per ticker data."""
+    data = {}
+    for name in names:
+        d = _load_ticker(name, directory)
+        if d and len(d["Date"]):
+            data[name] = d
+
+    if data:
+        dates = np.unique(np.concatenate([d["Date"] for d in data.values()]))
+    else:
+        dates = np.empty(0, dtype="datetime64[D]")
+    tickers = list(data)
+
+    tmp = os.path.join(directory, PANEL + ".tmp")
+    panel = np.lib.format.open_memmap(tmp, mode='w+', dtype="<f8",
+                                      shape=(len(fields), len(tickers), len(dates)))
+    panel[:] = np.nan
+    for t, name in enumerate(tickers):
+        d = data[name]
+        pos = np.searchsorted(dates, d["Date"])
+        for f, field in enumerate(fields):
+            if field not in d or not len(d[field]):
+                continue
+            col = d[field]
+            panel[f, t, pos[len(pos)-len(col):]] = col
+    panel.flush()
+    del panel
+
+    np.save(os.path.join(directory, DATES), dates)
+    os.replace(tmp, os.path.join(directory, PANEL))
+    index = {
+        "fields": {field: f for f, field in enumerate(fields)},
+        "tickers": {name: t for t, name in enumerate(tickers)},
+        "start": str(dates[0]) if len(dates) else None,
+    }
+    tmp = os.path.join(directory, INDEX + ".tmp")
+    with open(tmp, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp, os.path.join(directory, INDEX))
+
+
+def load_index(directory=DIRECTORY):
+    try:
+        with open(os.path.join(directory, INDEX), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def stale(names, directory=DIRECTORY):
+    """True if the panel is missing, misses a name or is older than its data."""
+    index = load_index(directory)
+    if index is None or not os.path.exists(os.path.join(directory, PANEL)):
+        return True
+    built = os.path.getmtime(os.path.join(directory, PANEL))
+    for name in names:
+        if store.exists(name, directory):
+            f = os.path.join(store.path(name, directory), store.META)
+        else:
+            f = os.path.join(directory, name + ".json")
+        if not os.path.exists(f):
+            continue
+        if name not in index["tickers"] or os.path.getmtime(f) > built:
+            return True
+    return False
+
+
+def open_panel(directory=DIRECTORY):
+    """Return (index, dates, panel) with the panel memory-mapped read only."""
+    index = load_index(directory)
+    panel = np.load(os.path.join(directory, PANEL), mmap_mode='r')
+    dates = np.load(os.path.join(directory, DATES))
+    return index, dates, panel
+
+
+def column(field, directory=DIRECTORY):
+    """
+    Return (tickers, dates, values) for one field, values is a read only
+    (tickers, dates) view into the panel, NaN where a ticker has no value.
+    """
+    index, dates, panel = open_panel(directory)
+    return list(index["tickers"]), dates, panel[index["fields"][field]]
+
+
+def series(name, field, directory=DIRECTORY):
+    """Values of field for one ticker with the leading/trailing gaps removed."""
+    index, dates, panel = open_panel(directory)
+    row = panel[index["fields"][field], index["tickers"][name]]
+    ok = np.flatnonzero(~np.isnan(row))
+    if not len(ok):
+        return dates[:0], row[:0]
+    return dates[ok[0]:ok[-1]+1], row[ok[0]:ok[-1]+1]
+
+
+if __name__ == "__main__":
+    build(sys.argv[1:] if len(sys.argv) > 1 else store.names())
@@ -0,0 +1,192 @@
+"""
+Streaming refresh: fetch -> merge -> compute -> write.
+
+Downloads run on download.fetch's thread pool and feed a bounded queue.
+The calling thread merges each frame into the stored series and hands
+the slope computation to the compute stage's process pool. Finished
+tickers go through a second bounded queue to a writer thread. The
+network, the cores and the disk are busy at the same time, and at most
+about 3 * depth tickers are held in memory.
+
+Every stage counts its items and the time it spent working, run()
+returns these so a refresh can report where the time went. plan() picks
+the tickers and start dates from the store manifest alone.
+"""
+import os
+import time
+import queue
+import threading
+from collections import deque
+
+from stockutils import store
+from stockutils import utils
+from stockutils import compute
+from stockutils import download
+from stockutils import tradingcal
+
+_DONE = object()
+
+
+class Stage:
+    """Items handled and busy seconds of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+
+    def add(self, seconds, items=1):
+        self.busy += seconds
+        self.items += items
+
+    def __str__(self):
+        rate = self.items / self.busy if self.busy else 0.0
+        return f"{self.name:<8} {self.items:>5} items {self.busy:8.2f}s busy {rate:8.1f}/s"
+
+
+def plan(names, today, begin, directory=store.DIRECTORY):
+    """
+    name -> start date for the tickers that need a download, from the
+    manifest only. A ticker is current when it already has the last
+    session of its exchange before today (tradingcal), so weekends and
+    holidays plan nothing. The last stored day is fetched again so a
+    revised bar gets updated, unknown tickers start at begin.
+    """
+    manifest = store.manifest(directory)
+    out = {}
+    for name in names:
+        last = (manifest.get(name) or {}).get("last_date")
+        if last is None:
+            out[name] = begin
+        elif last < tradingcal.last_session(tradingcal.exchange_of(name), today).isoformat():
+            out[name] = last
+    return out
+
+
+def _slopes(t):
+    start = time.perf_counter()
+    name, out = compute.slopes(t)
+    return name, out, time.perf_counter() - start
+
+
+def run(jobs, end, fetch_fn=download.yf_download, workers=None, depth=8,
+        on_fetched=None, directory=store.DIRECTORY, **fetch_kw):
+    """
+    Refresh the tickers in jobs, a dict of yahoo symbol -> (name, start).
+    on_fetched(symbol, df) is called for every downloaded frame. workers
+    is the compute pool size (see compute.executor), depth bounds every
+    queue between stages. fetch_kw goes to download.fetch. Returns a dict
+    of Stage by name plus the wall time under "wall".
+    """
+    stages = {name: Stage(name) for name in ("fetch", "merge", "compute", "write")}
+    fetched = queue.Queue(maxsize=depth)
+    finished = queue.Queue(maxsize=depth)
+    errors = []
+    stop = threading.Event()
+    fetch_kw.setdefault("pending", 2)
+    wall = time.perf_counter()
+
+    def put(q, item):
+        # give up when the consumer is gone instead of blocking forever
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def fetcher():
+        try:
+            requests = [(sym, start) for sym, (name, start) in jobs.items()]
+            t = time.perf_counter()
+            for sym, df in download.fetch(requests, end=end, download=fetch_fn, **fetch_kw):
+                stages["fetch"].add(time.perf_counter() - t)
+                put(fetched, (sym, df))
+                if stop.is_set():
+                    return
+                t = time.perf_counter()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(fetched, _DONE)
+
+    def writer():
+        while True:
+            try:
+                item = finished.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            name, d = item
+            t = time.perf_counter()
+            try:
+                store.save(name, d, directory)
+            except Exception as e:
+                errors.append(e)
+            stages["write"].add(time.perf_counter() - t)
+
+    # the compute workers are forked here, before there are other threads
+    pool = compute.executor(workers)
+    threads = [threading.Thread(target=fetcher, daemon=True),
+               threading.Thread(target=writer, daemon=True)]
+    for th in threads:
+        th.start()
+
+    pending = deque()
+
+    def finish_oldest():
+        name, d, fut = pending.popleft()
+        _, out, seconds = fut.result()
+        stages["compute"].add(seconds)
+        d.update(out)
+        finished.put((name, d))
+
+    try:
+        while True:
+            item = fetched.get()
+            if item is _DONE:
+                break
+            sym, df = item
+            if on_fetched is not None:
+                on_fetched(sym, df)
+            name, start = jobs[sym]
+
+            t = time.perf_counter()
+            d = utils.rd_d(os.path.join(directory, name + ".json"))
+            d, since = utils.merge_yf2d(df, d)
+            stages["merge"].add(time.perf_counter() - t)
+            if not d:
+                continue
+            if "Volume" not in d:
+                finished.put((name, d))
+                continue
+
+            task = compute.task(name, d, since)
+            if pool is None:
+                _, out, seconds = _slopes(task)
+                stages["compute"].add(seconds)
+                d.update(out)
+                finished.put((name, d))
+                continue
+            pending.append((name, d, pool.submit(_slopes, task)))
+            while len(pending) >= depth:
+                finish_oldest()
+        while pending:
+            finish_oldest()
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        put(finished, _DONE)
+        for th in threads:
+            th.join()
+
+    if errors:
+        raise errors[0]
+    stages["wall"] = time.perf_counter() - wall
+    return stages
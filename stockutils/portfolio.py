@@ -0,0 +1,108 @@
+"""
+Cost basis engine for the portfolio dashboard (moving method model).
+
+Per stock, in transaction order:
+
+  buy  nb shares at bb SEK/share (bb_local in instrument currency)
+       V += nb*bb, N += nb, B and B_local are the share weighted averages,
+       D is the value weighted holding time in days
+  sell ns shares
+       N = max(N - ns, 0), V = N*B, B and D unchanged, V = D = 0 when N hits 0
+
+All of it is done with grouped cumulative operations. N is a cumulative
+sum clamped at zero. Between two full closures every sell keeps a fraction
+rho = N_after/N_before of the position, so V, B_local*N and V*D all follow
+x_k = rho_k*x_(k-1) + b_k, which is x = P*cumsum(b/P) with P = cumprod(rho).
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["V", "D", "N", "B", "B_local", "sell_value", "buy_value_total",
+           "buy_shares_total", "currency"]
+
+
+def _num(s, default):
+    return pd.to_numeric(s, errors="coerce").fillna(default).astype(float)
+
+
+def build(df, exclude_stocks=(), today=None):
+    """
+    Compute the position of every stock from the broker transactions df.
+    Returns a DataFrame indexed by stock (first appearance order) with the
+    columns in COLUMNS.
+    """
+    if today is None:
+        today = pd.Timestamp.now().normalize()
+
+    ttype = df["Typ av transaktion"].astype(str).str.lower()
+    stock = df["Värdepapper/beskrivning"]
+    keep = ttype.isin(["köp", "sälj"]) & stock.notna()
+    keep &= ~stock.astype(str).str.strip().str.lower().isin(exclude_stocks)
+    tx = df[keep]
+    if tx.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    ttype = ttype[keep]
+    stock = tx["Värdepapper/beskrivning"].to_numpy()
+
+    is_buy = ttype.str.contains("köp").to_numpy()
+    is_sell = ~is_buy & ttype.str.contains("sälj").to_numpy()
+    qty = _num(tx["Antal"], 0.0).abs().to_numpy()
+    kurs = _num(tx["Kurs"], 0.0).to_numpy()
+    courtage = _num(tx["Courtage"], 0.0).abs().to_numpy()
+    belopp = _num(tx["Belopp"], 0.0).abs().to_numpy()
+    valutakurs = _num(tx["Valutakurs"], 1.0).replace(0.0, 1.0).to_numpy()
+    currency = tx["Instrumentvaluta"].fillna("SEK").to_numpy()
+
+    nz = qty != 0
+    safe_qty = np.where(nz, qty, 1.0)
+    execution_total = (qty * kurs * valutakurs + courtage) / valutakurs
+    bb_local = np.where(nz, execution_total / safe_qty, 0.0)
+    bb = np.where(nz, belopp / safe_qty, 0.0)
+    days = (today - pd.to_datetime(tx["Datum"]).dt.normalize()).dt.days.to_numpy()
+    days = np.where(days <= 0, 1, days)
+
+    # --- shares held, a cumulative sum that can not go below zero ---
+    key = pd.Series(pd.factorize(stock)[0])
+    signed = pd.Series(np.where(is_buy, qty, np.where(is_sell, -qty, 0.0)))
+    total = signed.groupby(key).cumsum()
+    floor = np.minimum(total.groupby(key).cummin(), 0.0)
+    N = (total - floor).to_numpy()
+    N_before = pd.Series(N).groupby(key).shift(fill_value=0.0).to_numpy()
+
+    # --- fraction kept by each sell, closures start a new segment ---
+    closed = is_sell & (N_before > 0) & (N == 0)
+    rho = np.where(is_sell & (N_before > 0) & ~closed, N / np.where(N_before > 0, N_before, 1.0), 1.0)
+    seg = pd.Series(closed.astype(int)).groupby(key).cumsum()
+    group = [key, seg]
+    P = pd.Series(rho).groupby(group).cumprod().to_numpy()
+
+    def carried(b):
+        return P * pd.Series(np.where(is_buy, b, 0.0) / P).groupby(group).cumsum().to_numpy()
+
+    V = carried(qty * bb)
+    Z = carried(qty * bb_local)
+    Y = carried(qty * bb * days)
+
+    held = N > 0
+    safe_N = np.where(held, N, 1.0)
+    # a buy that leaves nothing held (zero shares) resets the averages
+    B = pd.Series(np.where(held, V / safe_N, np.where(is_buy, 0.0, np.nan))).groupby(key).ffill().fillna(0.0)
+    B_local = pd.Series(np.where(held, Z / safe_N, np.where(is_buy, 0.0, np.nan))).groupby(key).ffill().fillna(0.0)
+    D = np.where(held & (V > 0), Y / np.where(V > 0, V, 1.0), 0.0)
+    V = np.where(held, V, 0.0)
+
+    rows = pd.DataFrame({
+        "stock": stock, "V": V, "D": D, "N": N, "B": B.to_numpy(),
+        "B_local": B_local.to_numpy(),
+        "sell_value": np.where(is_sell, belopp, 0.0),
+        "buy_value_total": np.where(is_buy, belopp, 0.0),
+        "buy_shares_total": np.where(is_buy, qty, 0.0),
+        "currency": currency,
+    })
+    g = rows.groupby("stock", sort=False)
+    out = g[["V", "D", "N", "B", "B_local", "currency"]].last()
+    out[["sell_value", "buy_value_total", "buy_shares_total"]] = g[
+        ["sell_value", "buy_value_total", "buy_shares_total"]].sum()
+    out["currency"] = g["currency"].first()
+    out.index.name = None
+    return out[COLUMNS]
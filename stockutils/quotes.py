@@ -0,0 +1,122 @@
+"""
+Live quotes for the dashboard with a shared TTL cache.
+
+All symbols and currency pairs a page needs are collected and fetched in
+one prefetch() call, the source fetches them concurrently, so a cold load
+costs about one round trip instead of one per holding. The source is
+pluggable: anything with fetch(symbols) -> {symbol: price or None}.
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class YahooSource:
+    """lastPrice from yfinance fast_info, fetched on a thread pool."""
+
+    def __init__(self, workers=8):
+        self.workers = workers
+
+    def _one(self, symbol):
+        import yfinance as yf
+        try:
+            price = yf.Ticker(symbol).fast_info.get("lastPrice")
+            return float(price) if price is not None else None
+        except Exception:
+            return None
+
+    def fetch(self, symbols):
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(symbols))) as pool:
+            return dict(zip(symbols, pool.map(self._one, symbols)))
+
+
+class FakeSource:
+    """Fixed prices for offline runs and tests, counts the fetch calls."""
+
+    def __init__(self, prices, delay=0.0):
+        self.prices = dict(prices)
+        self.delay = delay
+        self.calls = 0
+
+    def fetch(self, symbols):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {s: self.prices.get(s) for s in symbols}
+
+
+def fx_pair(from_currency, to_currency="SEK"):
+    """Yahoo symbol for the rate, None if no conversion is needed."""
+    if from_currency is None or from_currency != from_currency:
+        return None
+    cur = str(from_currency).strip().upper()
+    if cur == to_currency:
+        return None
+    return f"{cur}{to_currency}=X"
+
+
+class QuoteService:
+
+    def __init__(self, source=None, ttl=300):
+        self.source = source if source is not None else YahooSource()
+        self.ttl = ttl
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def _fresh(self, symbol, now):
+        hit = self.cache.get(symbol)
+        return hit is not None and now - hit[0] < self.ttl
+
+    def prefetch(self, symbols):
+        """
+        Fetch every symbol that is not cached or has expired in one go.
+        Returns symbol -> price for the symbols it fetched.
+        """
+        now = time.time()
+        with self.lock:
+            missing = list(dict.fromkeys(s for s in symbols if s and not self._fresh(s, now)))
+        if not missing:
+            return {}
+        prices = self.source.fetch(missing)
+        now = time.time()
+        fetched = {s: prices.get(s) for s in missing}
+        with self.lock:
+            for s, price in fetched.items():
+                self.cache[s] = (now, price)
+        return fetched
+
+    def get(self, symbol):
+        if not symbol:
+            return None
+        with self.lock:
+            if self._fresh(symbol, time.time()):
+                return self.cache[symbol][1]
+        fetched = self.prefetch([symbol])
+        if symbol in fetched:
+            return fetched[symbol]
+        # fetched by another session meanwhile, which may also have cleared it
+        with self.lock:
+            return self.cache.get(symbol, (0, None))[1]
+
+    def price(self, yahoo_symbol):
+        """Last price, London quotes converted from pence to pounds."""
+        price = self.get(yahoo_symbol)
+        if price is not None and str(yahoo_symbol).upper().endswith(".L"):
+            price = price / 100.0
+        return price
+
+    def fx(self, from_currency, to_currency="SEK"):
+        pair = fx_pair(from_currency, to_currency)
+        if pair is None:
+            return 1.0
+        rate = self.get(pair)
+        return float(rate) if rate is not None else 1.0
+
+    def prefetch_holdings(self, symbols, currencies, to_currency="SEK"):
+        self.prefetch(list(symbols) + [fx_pair(c, to_currency) for c in currencies])
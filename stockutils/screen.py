@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Universe screener over the price panel.
+
+For every field the last value of each ticker is classed by how close it
+is to the min or max of that ticker's history, the same +++ .. --- classes
+as utils.is_close_to_max_min, computed for all tickers at once on the
+(tickers, dates) block of the panel.
+
+    python -m stockutils.screen [--fields Slope60 Slope120] [--thresholds 2 5 10] [--csv out.csv]
+"""
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from stockutils import panel
+from stockutils import universe
+
+FIELDS = ["Slope60", "Slope120", "Slope360", "Adj Close"]
+THRESHOLDS = (2, 5, 10)  # percent of the range for +++/---, ++/-- and +/-
+CLASSES = {3: "+++", 2: "++", 1: "+", 0: "neutral", -1: "-", -2: "--", -3: "---"}
+
+
+def label(field):
+    """Column name of a field's class, Slope60 -> Rec60, Adj Close -> RecPrice."""
+    if field.startswith("Slope"):
+        return "Rec" + field[len("Slope"):]
+    return "RecPrice" if field == "Adj Close" else "Rec" + field.replace(" ", "")
+
+
+def last_valid(values):
+    """Last non NaN value of every row, NaN for empty rows."""
+    ok = ~np.isnan(values)
+    last = values.shape[1] - 1 - np.argmax(ok[:, ::-1], axis=1)
+    out = values[np.arange(len(values)), last]
+    out[~ok.any(axis=1)] = np.nan
+    return out
+
+
+def classify(values, thresholds=THRESHOLDS):
+    """
+    Class score per row of values: 3/2/1 when the last value is within
+    the first/second/third threshold (percent of the range) of the row
+    min, -3/-2/-1 for the max, 0 otherwise. Closeness to the max wins like
+    in is_close_to_max_min. Rows without values get NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    if not values.shape[1]:
+        return np.full(len(values), np.nan)
+    # fmin/fmax skip NaN and give NaN for empty rows without warning
+    lo = np.fmin.reduce(values, axis=1)
+    hi = np.fmax.reduce(values, axis=1)
+    value = last_valid(values)
+    limits = np.asarray(thresholds, dtype=float)[:, None] / 100.0 * (hi - lo)
+
+    dmin = np.abs(value - lo)
+    dmax = np.abs(value - hi)
+    # how many thresholds the distance is within, 0..3
+    near_min = (dmin <= limits).sum(axis=0)
+    near_max = (dmax <= limits).sum(axis=0)
+    score = np.where(near_max > 0, -near_max, near_min).astype(float)
+    score[np.isnan(value)] = np.nan
+    return score
+
+
+def screen(names=None, fields=FIELDS, thresholds=THRESHOLDS, directory=panel.DIRECTORY):
+    """
+    Class every ticker on fields. Returns a DataFrame with name and one
+    class column per field (see label()), strongest +++ first by field
+    order. names limits the tickers, default all in the panel.
+    """
+    index = panel.load_index(directory)
+    tickers = list(index["tickers"])
+    rows = np.arange(len(tickers))
+    if names is not None:
+        keep = set(names)
+        rows = np.array([t for t, name in enumerate(tickers) if name in keep], dtype=int)
+    _, _, pnl = panel.open_panel(directory)
+
+    scores = {}
+    for field in fields:
+        if field not in index["fields"]:
+            raise KeyError(f"{field} not in panel")
+        scores[label(field)] = classify(pnl[index["fields"][field]][rows], thresholds)
+
+    df = pd.DataFrame(scores)
+    df.insert(0, "name", [tickers[t] for t in rows])
+    cols = list(scores)
+    df = df.dropna(subset=cols, how="all")
+    df = df.sort_values(cols, ascending=False, na_position="last", kind="stable")
+    for c in cols:
+        df[c] = df[c].map(CLASSES)
+    return df.reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen the universe for +++/--- classes.")
+    parser.add_argument("--fields", nargs="+", default=FIELDS)
+    parser.add_argument("--thresholds", nargs=3, type=float, default=THRESHOLDS,
+                        help="percent of range for the 3 class steps")
+    parser.add_argument("--csv", help="write the table to this file")
+    args = parser.parse_args(argv)
+
+    names = universe.names()
+    if panel.stale(names):
+        panel.build(names)
+    df = screen(names, args.fields, args.thresholds)
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+    else:
+        from tabulate import tabulate
+        print(tabulate(df, headers="keys", tablefmt="plain", showindex=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
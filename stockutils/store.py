@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Columnar price store.
+
+Every ticker gets a directory yfdata/<NAME>/ with one raw binary file per
+column (<column>.bin) and a meta.json holding the column order and dtypes.
+Dates are stored as datetime64[D], numbers as int64/float64, so a column
+can be memory-mapped straight into a numpy array.
+
+Writes only touch the part of a column that changed: the common prefix
+with what is on disk is kept, the file is truncated there and the new tail
+appended. A daily refresh therefore appends a few bytes per column instead
+of rewriting the whole history. meta.json also holds the committed length
+of every column and is replaced last, load() cuts each column to its
+length, so a save that dies half way leaves the previous rows readable. A column whose
+committed rows change is written to a temporary file and swapped in.
+
+yfdata/manifest.json keeps per ticker the last date, row count, a
+checksum of the columns and when the slopes were last computed. It is
+rewritten atomically on every save, so planning a refresh only needs the
+manifest and never opens the ticker files.
+
+Saves hold yfdata/.lock, a thread lock plus an fcntl lock where the
+platform has one, so the dashboard and analyse.py can write the same
+store at the same time without losing each other's manifest entries.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows, only threads are locked out
+    fcntl = None
+
+import numpy as np
+
+DIRECTORY = "yfdata"
+META = "meta.json"
+MANIFEST = "manifest.json"
+LOCK = ".lock"
+
+_lock = threading.RLock()
+_depth = 0
+
+
+@contextmanager
+def locked(directory=DIRECTORY):
+    """Hold the store lock against other threads and processes, reentrant."""
+    global _depth
+    with _lock:
+        f = None
+        if _depth == 0 and fcntl is not None:
+            os.makedirs(directory, exist_ok=True)
+            f = open(os.path.join(directory, LOCK), 'a')
+            fcntl.flock(f, fcntl.LOCK_EX)
+        _depth += 1
+        try:
+            yield
+        finally:
+            _depth -= 1
+            if f is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+
+
+def path(name, directory=DIRECTORY):
+    return os.path.join(directory, name)
+
+
+def exists(name, directory=DIRECTORY):
+    return os.path.exists(os.path.join(path(name, directory), META))
+
+
+def names(directory=DIRECTORY):
+    """Names of all tickers in the store or still only in json files."""
+    found = {os.path.basename(os.path.dirname(f))
+             for f in glob.glob(os.path.join(directory, "*", META))}
+    for f in glob.glob(os.path.join(directory, "*.json")):
+        base = os.path.basename(f)[:-len(".json")]
+        if "." in base:
+            found.add(base)
+    return sorted(found)
+
+
+def _column_file(p, col):
+    return os.path.join(p, col + ".bin")
+
+
+def _read_meta(p):
+    try:
+        with open(os.path.join(p, META), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"columns": {}}
+
+
+def _write_meta(p, meta):
+    tmp = os.path.join(p, META + ".tmp")
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(p, META))
+
+
+def _to_array(col, values):
+    if col == "Date":
+        return np.asarray(values, dtype="datetime64[D]")
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iub":
+        return arr.astype("<i8")
+    return arr.astype("<f8")
+
+
+def _mismatch(a, b):
+    """Index of the first element where a and b differ (NaN equals NaN)."""
+    m = min(len(a), len(b))
+    a = a[:m]
+    b = b[:m]
+    same = a == b
+    if a.dtype.kind == "f":
+        same |= np.isnan(a) & np.isnan(b)
+    diff = np.flatnonzero(~same)
+    return int(diff[0]) if len(diff) else m
+
+
+def load(name, columns=None, directory=DIRECTORY):
+    """
+    Return a dict of column -> read only memory-mapped numpy array.
+    Returns {} if the ticker is not in the store.
+    """
+    p = path(name, directory)
+    meta = _read_meta(p)
+    lengths = meta.get("lengths", {})
+    d = {}
+    for col, dtype in meta["columns"].items():
+        if columns is not None and col not in columns:
+            continue
+        f = _column_file(p, col)
+        n = lengths.get(col)
+        if os.path.getsize(f) == 0 or n == 0:
+            d[col] = np.empty(0, dtype=dtype)
+        else:
+            # bytes past the committed length are from a save that did not finish
+            d[col] = np.memmap(f, dtype=dtype, mode='r')[:n]
+    return d
+
+
+def read(name, directory=DIRECTORY):
+    """Same as load() but as a dict of lists with dates as YYYY-MM-DD."""
+    d = {}
+    for col, arr in load(name, directory=directory).items():
+        if col == "Date":
+            d[col] = np.datetime_as_string(arr, unit="D").tolist()
+        else:
+            d[col] = arr.tolist()
+    return d
+
+
+def save(name, d, directory=DIRECTORY):
+    """
+    Write the dict of columns d (lists or arrays) for name. Only the part of
+    each column that differs from what is on disk is written.
+    """
+    with locked(directory):
+        _save(name, d, directory)
+
+
+def _save(name, d, directory):
+    p = path(name, directory)
+    os.makedirs(p, exist_ok=True)
+    meta = _read_meta(p)
+    lengths = meta.get("lengths", {})
+    columns = {}
+
+    arrays = {}
+    computed = False
+    for col, values in d.items():
+        arr = _to_array(col, values)
+        arrays[col] = arr
+        dtype = arr.dtype.str
+        f = _column_file(p, col)
+        keep = 0
+        size = -1
+        if meta["columns"].get(col) == dtype and os.path.exists(f):
+            if os.path.getsize(f):
+                old = np.memmap(f, dtype=dtype, mode='r')[:lengths.get(col)]
+                keep = _mismatch(old, arr)
+                size = len(old)
+                del old
+            else:
+                size = 0
+        if keep < size or (size < 0 and col in meta["columns"]):
+            # committed rows change: swap in a new file, never rewrite them in place
+            tmp = f + ".tmp"
+            with open(tmp, 'wb') as fh:
+                fh.write(arr.tobytes())
+            os.replace(tmp, f)
+        else:
+            # only drops bytes past the committed rows
+            mode = 'r+b' if size >= 0 else 'wb'
+            with open(f, mode) as fh:
+                fh.truncate(keep * arr.itemsize)
+                fh.seek(0, os.SEEK_END)
+                fh.write(arr[keep:].tobytes())
+        columns[col] = dtype
+        if col.startswith("Slope") and (keep < len(arr) or size != len(arr)):
+            computed = True
+
+    # columns differ in length, the slopes are shorter than Date
+    lengths = {col: len(arr) for col, arr in arrays.items()}
+    _write_meta(p, {"columns": columns, "lengths": lengths})
+    for col in meta["columns"]:
+        if col not in columns:
+            f = _column_file(p, col)
+            if os.path.exists(f):
+                os.remove(f)
+    _update_manifest(name, arrays, computed, directory)
+
+
+def checksum(arrays):
+    """sha1 over the column names and bytes, in column name order."""
+    h = hashlib.sha1()
+    for col in sorted(arrays):
+        h.update(col.encode("utf-8"))
+        h.update(np.ascontiguousarray(arrays[col]).tobytes())
+    return h.hexdigest()
+
+
+def entry(arrays, computed_at=None):
+    dates = arrays.get("Date")
+    return {
+        "last_date": str(dates[-1]) if dates is not None and len(dates) else None,
+        "rows": len(dates) if dates is not None else 0,
+        "checksum": checksum(arrays),
+        "computed_at": computed_at,
+    }
+
+
+def read_manifest(directory=DIRECTORY):
+    """name -> entry, None when there is no manifest yet."""
+    try:
+        with open(os.path.join(directory, MANIFEST), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_manifest(manifest, directory):
+    tmp = os.path.join(directory, MANIFEST + ".tmp")
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+
+
+def _update_manifest(name, arrays, computed, directory):
+    with locked(directory):
+        # built from the whole store first, a manifest holding only this
+        # ticker would make every other one look new to the planner
+        entries = manifest(directory)
+        old = entries.get(name) or {}
+        computed_at = time.time() if computed else old.get("computed_at")
+        entries[name] = entry(arrays, computed_at)
+        _write_manifest(entries, directory)
+
+
+def rebuild_manifest(directory=DIRECTORY):
+    """
+    Manifest from the stored tickers and the ones still only in json
+    files, for stores written before it existed.
+    """
+    with locked(directory):
+        old = read_manifest(directory) or {}
+        manifest = {}
+        for name in names(directory):
+            if exists(name, directory):
+                f = os.path.join(path(name, directory), META)
+                arrays = load(name, directory=directory)
+            else:
+                # not migrated yet, still only yfdata/<NAME>.json
+                f = os.path.join(directory, name + ".json")
+                try:
+                    with open(f, 'r') as json_file:
+                        d = json.load(json_file)
+                except ValueError:
+                    continue
+                if not isinstance(d, dict) or "Date" not in d:
+                    continue
+                arrays = {col: _to_array(col, values) for col, values in d.items()}
+            computed_at = (old.get(name) or {}).get("computed_at")
+            if computed_at is None and any(c.startswith("Slope") for c in arrays):
+                computed_at = os.path.getmtime(f)
+            manifest[name] = entry(arrays, computed_at)
+        _write_manifest(manifest, directory)
+        return manifest
+
+
+def manifest(directory=DIRECTORY):
+    """The manifest, built from the store first if there is none."""
+    m = read_manifest(directory)
+    return m if m is not None else rebuild_manifest(directory)
+
+
+def migrate(directory=DIRECTORY):
+    """One shot conversion of yfdata/<NAME>.json files into the store."""
+    n = 0
+    for f in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        name = os.path.basename(f)[:-len(".json")]
+        try:
+            with open(f, 'r') as json_file:
+                d = json.load(json_file)
+        except ValueError:
+            print(f"Skipping {f}, not valid json")
+            continue
+        if not isinstance(d, dict) or "Date" not in d:
+            continue
+        save(name, d, directory)
+        n += 1
+    rebuild_manifest(directory)
+    print(f"Migrated {n} tickers to {directory}/")
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else DIRECTORY)
@@ -0,0 +1,160 @@
+"""
+Offline trading calendar for the exchanges in list.txt.
+
+Sessions are the weekdays that are not exchange holidays. Holidays are
+computed from rules per exchange suffix (fixed days, Easter based days,
+n-th weekday of a month, US/UK weekend substitution), so the calendar
+works for any year without a download. Unknown suffixes only skip
+weekends.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+
+
+def easter(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year, month, weekday, n):
+    """n-th (1 based, -1 = last) weekday (0 = Monday) of a month."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _midsummer_eve(year):
+    """The Friday between June 19 and 25."""
+    first = date(year, 6, 19)
+    return first + timedelta(days=(4 - first.weekday()) % 7)
+
+
+def _observed_us(day):
+    """Saturday holidays are taken on Friday, Sunday ones on Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _uk_christmas(year):
+    # Christmas and Boxing Day move to the next free weekdays
+    days = []
+    for d in (date(year, 12, 25), date(year, 12, 26)):
+        while d.weekday() >= 5 or d in days:
+            d += timedelta(days=1)
+        days.append(d)
+    return days
+
+
+def _nordic(year, e):
+    return {date(year, 1, 1), e - timedelta(days=2), e + timedelta(days=1),
+            date(year, 12, 24), date(year, 12, 25), date(year, 12, 26), date(year, 12, 31)}
+
+
+def _st(year):
+    e = easter(year)
+    return _nordic(year, e) | {date(year, 1, 6), date(year, 5, 1), e + timedelta(days=39),
+                               date(year, 6, 6), _midsummer_eve(year)}
+
+
+def _ol(year):
+    e = easter(year)
+    return _nordic(year, e) | {e - timedelta(days=3), date(year, 5, 1), date(year, 5, 17),
+                               e + timedelta(days=39), e + timedelta(days=50)}
+
+
+def _co(year):
+    e = easter(year)
+    days = _nordic(year, e) | {e - timedelta(days=3), e + timedelta(days=39), e + timedelta(days=40),
+                               e + timedelta(days=50), date(year, 6, 5)}
+    if year < 2024:
+        days.add(e + timedelta(days=26))  # Great Prayer Day, abolished from 2024
+    return days
+
+
+def _he(year):
+    e = easter(year)
+    return _nordic(year, e) | {date(year, 1, 6), date(year, 5, 1), e + timedelta(days=39),
+                               _midsummer_eve(year), date(year, 12, 6)}
+
+
+def _de(year):
+    e = easter(year)
+    return _nordic(year, e) | {date(year, 5, 1)}
+
+
+def _l(year):
+    e = easter(year)
+    new_year = date(year, 1, 1)
+    while new_year.weekday() >= 5:
+        new_year += timedelta(days=1)
+    days = {new_year, e - timedelta(days=2), e + timedelta(days=1),
+            nth_weekday(year, 5, 0, 1), nth_weekday(year, 5, 0, -1), nth_weekday(year, 8, 0, -1)}
+    days.update(_uk_christmas(year))
+    days.update(d for d in UK_SPECIAL if d.year == year)
+    if year == 2020:
+        days.discard(nth_weekday(year, 5, 0, 1))
+        days.add(date(2020, 5, 8))
+    if year == 2022:
+        days.discard(nth_weekday(year, 5, 0, -1))
+    return days
+
+
+def _us(year):
+    e = easter(year)
+    days = {nth_weekday(year, 1, 0, 3), nth_weekday(year, 2, 0, 3), e - timedelta(days=2),
+            nth_weekday(year, 5, 0, -1), _observed_us(date(year, 7, 4)), nth_weekday(year, 9, 0, 1),
+            nth_weekday(year, 11, 3, 4), _observed_us(date(year, 12, 25))}
+    # a Saturday New Year is not made up on the Friday before
+    if date(year, 1, 1).weekday() != 5:
+        days.add(_observed_us(date(year, 1, 1)))
+    if year >= 2022:
+        days.add(_observed_us(date(year, 6, 19)))
+    days.update(d for d in US_SPECIAL if d.year == year)
+    return days
+
+
+# one-off closures
+UK_SPECIAL = {date(2022, 6, 2), date(2022, 6, 3), date(2022, 9, 19), date(2023, 5, 8)}
+US_SPECIAL = {date(2025, 1, 9)}
+
+RULES = {"ST": _st, "OL": _ol, "CO": _co, "HE": _he, "DE": _de, "L": _l, "US": _us}
+
+
+@lru_cache(maxsize=None)
+def holidays(exchange, year):
+    """Weekday closures of an exchange suffix in a year, empty for unknown ones."""
+    rule = RULES.get(exchange)
+    return frozenset(rule(year)) if rule else frozenset()
+
+
+def exchange_of(name):
+    """Exchange suffix of a SYM.KEY name."""
+    return name.rsplit(".", 1)[-1] if "." in name else "US"
+
+
+def is_session(exchange, day):
+    return day.weekday() < 5 and day not in holidays(exchange, day.year)
+
+
+def last_session(exchange, before):
+    """The last session strictly before the date before."""
+    day = before - timedelta(days=1)
+    while not is_session(exchange, day):
+        day -= timedelta(days=1)
+    return day
+
@@ -0,0 +1,136 @@
+"""
+Persistent transaction store for the portfolio dashboard.
+
+Transactions live in a SQLite file with one row per unique transaction.
+The key is a sha1 over the UNIQUE_COLUMNS plus the occurrence number of
+identical rows within one file, and is the primary key. The
+broker export is only parsed and merged when its mtime/size changed and
+its content hash differs from the last ingest, otherwise sync() returns
+straight away.
+"""
+import os
+import json
+import sqlite3
+import hashlib
+
+import pandas as pd
+
+UNIQUE_COLUMNS = ["Datum", "Konto", "Typ av transaktion", "Värdepapper/beskrivning",
+                  "Antal", "Kurs", "Belopp", "ISIN"]
+
+
+def _connect(db_file):
+    con = sqlite3.connect(db_file)
+    con.execute('CREATE TABLE IF NOT EXISTS txn ("_key" TEXT PRIMARY KEY)')
+    con.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+    return con
+
+
+def _get_meta(con, name):
+    row = con.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _set_meta(con, name, value):
+    con.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (name, json.dumps(value)))
+
+
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def row_keys(df):
+    """
+    sha1 of the unique columns joined with |, one per row. Identical rows
+    in one file (two equal fills on the same day) are told apart by their
+    occurrence number, the first occurrence keeps the plain key.
+    """
+    cols = [df[c].astype(str) if c in df.columns else pd.Series("", index=df.index)
+            for c in UNIQUE_COLUMNS]
+    joined = cols[0].str.cat(cols[1:], sep="|")
+    nth = joined.groupby(joined).cumcount()
+    return [hashlib.sha1((s if n == 0 else f"{s}|#{n}").encode("utf-8")).hexdigest()
+            for s, n in zip(joined, nth)]
+
+
+def _columns(con):
+    return [r[1] for r in con.execute('PRAGMA table_info(txn)')]
+
+
+def count(con):
+    return con.execute('SELECT COUNT(*) FROM txn').fetchone()[0]
+
+
+def ingest(con, df):
+    """Insert the rows of df that are not stored yet, returns how many were new."""
+    if df.empty:
+        return 0
+    existing = set(_columns(con))
+    for col in df.columns:
+        if col not in existing:
+            kind = "REAL" if pd.api.types.is_numeric_dtype(df[col]) else "TEXT"
+            con.execute(f'ALTER TABLE txn ADD COLUMN "{col}" {kind}')
+    if "Datum" in existing or "Datum" in df.columns:
+        con.execute('CREATE INDEX IF NOT EXISTS txn_datum ON txn ("Datum")')
+
+    out = df.copy()
+    if "Datum" in out.columns:
+        out["Datum"] = pd.to_datetime(out["Datum"]).dt.strftime("%Y-%m-%d")
+    out.insert(0, "_key", row_keys(df))
+    out = out.astype(object).where(out.notna(), None)
+
+    before = count(con)
+    cols = ", ".join(f'"{c}"' for c in out.columns)
+    marks = ", ".join("?" * len(out.columns))
+    con.executemany(f'INSERT OR IGNORE INTO txn ({cols}) VALUES ({marks})',
+                    out.itertuples(index=False, name=None))
+    return count(con) - before
+
+
+def sync(csv_file, db_file, read, legacy_file=None):
+    """
+    Bring the store up to date with the broker export csv_file, read(path)
+    parses it into a DataFrame. A legacy cleaned csv is imported once into
+    an empty store. Returns a dict with the incoming, previously stored and
+    total row counts of the last ingest.
+    """
+    con = _connect(db_file)
+    try:
+        if legacy_file and os.path.exists(legacy_file) and count(con) == 0:
+            ingest(con, pd.read_csv(legacy_file, parse_dates=["Datum"]))
+
+        st = os.stat(csv_file)
+        stamp = [st.st_mtime_ns, st.st_size]
+        source = _get_meta(con, "source") or {}
+        if source.get("stamp") != stamp:
+            digest = _file_hash(csv_file)
+            if source.get("hash") != digest:
+                df = read(csv_file)
+                stored = count(con)
+                ingest(con, df)
+                source["stats"] = {"incoming": len(df), "stored": stored, "total": count(con)}
+            source["stamp"] = stamp
+            source["hash"] = digest
+            _set_meta(con, "source", source)
+            con.commit()
+        return source.get("stats") or {"incoming": 0, "stored": count(con), "total": count(con)}
+    finally:
+        con.close()
+
+
+def load(db_file):
+    """All stored transactions ordered by date, then by ingest order."""
+    con = _connect(db_file)
+    try:
+        order = 'ORDER BY "Datum", rowid' if "Datum" in _columns(con) else 'ORDER BY rowid'
+        df = pd.read_sql_query(f'SELECT * FROM txn {order}', con)
+    finally:
+        con.close()
+    df = df.drop(columns=["_key"])
+    if "Datum" in df.columns:
+        df["Datum"] = pd.to_datetime(df["Datum"])
+    return df
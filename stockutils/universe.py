@@ -0,0 +1,132 @@
+"""
+The stock universe from list.txt, parsed once and shared by all scripts.
+
+A line looks like "ST ATCO-A [Atlas Copco A, Atlas Copco]", lines starting
+with # and empty lines are ignored. The parsed result is kept in memory and
+in a pickle next to the list keyed on its mtime and size, so a script start
+or a Streamlit rerun only parses the file again after it was edited.
+"""
+import os
+import re
+import pickle
+
+LIST = "list.txt"
+
+_memo = {}
+
+
+def normalize(name):
+    """Lower case and collapse whitespace, used for alias lookups."""
+    return " ".join(str(name).split()).lower()
+
+
+def yahoo_symbol(sym, key):
+    return sym if key == "US" else sym + "." + key
+
+
+def parse(path=LIST):
+    """
+    Parse list.txt into
+
+    exchange: key -> {'symbol': [...], 'name': [[...], ...]}
+    tickers:  Yahoo symbol -> {'exchange', 'symbol', 'name' (SYM.KEY), 'names'}
+    alias:    normalized alias or symbol -> Yahoo symbol
+    display:  Yahoo symbol -> display name (first alias)
+    """
+    exchange = {}
+    tickers = {}
+    alias = {}
+    display = {}
+
+    with open(path, 'r', encoding="utf-8") as file:
+        for line in file:
+            # Strip leading/trailing whitespace
+            line = line.strip()
+            # Replace comma followed by one or more spaces with a comma
+            line = re.sub(r',\s+', ',', line)
+
+            # Skip empty lines and comments
+            if not line or line.startswith('#'):
+                continue
+
+            # Split the line into parts
+            parts = line.split(' ', 2)  # Split only on the first two spaces
+            if len(parts) < 3:
+                continue
+
+            key = parts[0]
+            sym = parts[1]
+            # Remove the square brackets and split the third part into a list
+            names = parts[2].strip('[]').split(',')
+
+            if key not in exchange:
+                exchange[key] = {'symbol': [], 'name': []}
+            exchange[key]['symbol'].append(sym)
+            exchange[key]['name'].append(names)
+
+            ysym = yahoo_symbol(sym, key)
+            tickers[ysym] = {
+                "exchange": key,
+                "symbol": sym,
+                "name": sym + "." + key,
+                "names": names,
+            }
+            display.setdefault(ysym, names[0])
+            for a in names + [sym]:
+                alias.setdefault(normalize(a), ysym)
+
+    return {"exchange": exchange, "tickers": tickers, "alias": alias, "display": display}
+
+
+def load(path=LIST):
+    """parse() with an in-process and an mtime keyed on-disk cache."""
+    st = os.stat(path)
+    stamp = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    if stamp in _memo:
+        return _memo[stamp]
+
+    directory, base = os.path.split(path)
+    cache = os.path.join(directory, "." + base + ".cache")
+    u = None
+    try:
+        with open(cache, 'rb') as f:
+            cached_stamp, cached = pickle.load(f)
+        if cached_stamp == stamp:
+            u = cached
+    except Exception:
+        pass
+
+    if u is None:
+        u = parse(path)
+        try:
+            tmp = cache + ".tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump((stamp, u), f)
+            os.replace(tmp, cache)
+        except OSError:
+            pass
+
+    _memo.clear()
+    _memo[stamp] = u
+    return u
+
+
+def exchange(path=LIST):
+    return load(path)["exchange"]
+
+
+def aliases(path=LIST):
+    return load(path)["alias"]
+
+
+def display_names(path=LIST):
+    return load(path)["display"]
+
+
+def yahoo_symbols(path=LIST):
+    return list(load(path)["tickers"])
+
+
+def names(path=LIST):
+    """SYM.KEY names as used for the files in yfdata/."""
+    return [t["name"] for t in load(path)["tickers"].values()]
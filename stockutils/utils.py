@@ -1,13 +1,42 @@
 import numpy as np
+import pandas as pd
 import itertools
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from datetime import datetime
 import os
 import sys
 import json
 import re
 from sklearn.linear_model import LinearRegression
+from stockutils import store
+
+def _next_lower(y, p):
+    """
+    For each position in p the first index k > p with y[k] < y[p], or not
+    y[k] >= y[p] for NaN, len(y) if there is none. Binary lifting over a
+    sparse table of range minima, O(n log n) without a Python loop per element.
+    """
+    n = len(y)
+    p = np.asarray(p, dtype=np.intp)
+    if not len(p):
+        return p
+    y = np.asarray(y, dtype=float)
+    low = np.where(np.isnan(y), -np.inf, y)
+    table = [low]  # table[l][k] = min(low[k:k+2**l])
+    while 2 ** len(table) <= n:
+        h = 2 ** (len(table) - 1)
+        prev = table[-1]
+        table.append(np.minimum(prev[:-h], prev[h:]))
+
+    level = y[p]
+    pos = p + 1
+    for l in range(len(table) - 1, -1, -1):
+        m = table[l]
+        ok = pos + 2 ** l <= n
+        ok[ok] = m[pos[ok]] >= level[ok]
+        pos = np.where(ok, pos + 2 ** l, pos)
+    return pos
+
 
 #try to use this function for better trend reversal detection
 def trend_break_hold_duration(
@@ -19,58 +48,81 @@ def trend_break_hold_duration(
 ):
     """
     Detect trend breaks and compute how many days each break holds.
-    """
-
-    import numpy as np
 
+    A break at i is a local low at i-1 (y falls into it and rises out of
+    it) at least min_depth below the max of y[i-window:i]. It holds until
+    y first drops below the low again, the next break is searched from
+    there so signals do not overlap.
+    """
     y = np.asarray(y)
+    n = len(y)
     results = []
+    if n < window + 4:
+        return results
+
+    # candidates i = window+2 .. n-2, all conditions at once
+    i = np.arange(window + 2, n - 1)
+    dy_prev = y[i-1] - y[i-2]
+    dy_curr = y[i] - y[i-1]
+    i = i[(dy_prev < 0) & (dy_curr > 0) & ~(y[i-2] - y[i-1] < min_drop) & ~(y[i] - y[i-1] < min_rise)]
+    # rolling max only over the windows of the local lows
+    recent_max = np.lib.stride_tricks.sliding_window_view(y, window)[i-window].max(axis=1)
+    depth = recent_max - y[i-1]
+    ok = ~(depth < min_depth)
+    cand = i[ok]
+    depth = depth[ok]
+    if not len(cand):
+        return results
+
+    # the hold of a break at i ends where y first drops below y[i-1]
+    ends = _next_lower(y, cand - 1)
+
+    k = 0
+    while k < len(cand):
+        c, j = int(cand[k]), int(ends[k])
+        results.append({
+            "index": c,
+            "value": y[c],
+            "hold_days": j - c,
+            "depth": depth[k]
+        })
+        k = np.searchsorted(cand, j)  # skip forward (avoid overlapping signals)
 
-    i = window + 2
-
-    while i < len(y) - 1:
-
-        # --- 1. detect trend break ---
-        dy_prev = y[i-1] - y[i-2]
-        dy_curr = y[i] - y[i-1]
-
-        if not (dy_prev < 0 and dy_curr > 0):
-            i += 1
-            continue
+    return results
 
-        drop = y[i-2] - y[i-1]
-        rise = y[i] - y[i-1]
 
-        if drop < min_drop or rise < min_rise:
-            i += 1
+def scan_trend_breaks(field="Slope60", names=None, recent=None, directory=store.DIRECTORY, **kw):
+    """
+    Run trend_break_hold_duration over field of every ticker in the panel
+    (or the given names) and return one table of the signals with name,
+    date, index, value, hold_days, depth and holding (still unbroken at
+    the last value). index, hold_days and recent count the ticker's own
+    rows, not the panel's date axis. recent keeps only signals in the last
+    recent rows of each series. kw is passed on to trend_break_hold_duration.
+    """
+    from stockutils import panel
+    tickers, dates, values = panel.column(field, directory)
+    rows = []
+    for t, name in enumerate(tickers):
+        if names is not None and name not in names:
             continue
-
-        recent_max = np.max(y[i-window:i])
-        depth = recent_max - y[i-1]
-
-        if depth < min_depth:
-            i += 1
+        row = np.asarray(values[t])
+        # the date axis is the union of all exchanges, keep this ticker's own days
+        valid = np.flatnonzero(~np.isnan(row))
+        if not len(valid):
             continue
-
-        # --- 2. measure hold duration ---
-        level = y[i-1]
-        j = i + 1
-
-        while j < len(y) and y[j] >= level:
-            j += 1
-
-        hold_days = j - i
-
-        results.append({
-            "index": i,
-            "value": y[i],
-            "hold_days": hold_days,
-            "depth": depth
-        })
-
-        i = j  # skip forward (avoid overlapping signals)
-
-    return results
+        y = row[valid]
+        for r in trend_break_hold_duration(y, **kw):
+            if recent is not None and r["index"] < len(y) - recent:
+                continue
+            rows.append({
+                "name": name,
+                "date": dates[valid[r["index"]]],
+                **r,
+                "holding": r["index"] + r["hold_days"] == len(y),
+            })
+    columns = ["name", "date", "index", "value", "hold_days", "depth", "holding"]
+    return pd.DataFrame(rows, columns=columns)
 
 # Define a function to suppress stdout
 class SuppressOutput:
@@ -88,6 +140,12 @@ class SuppressOutput:
 
 
 def rd_d(f):
+    # Prefer the binary store yfdata/<NAME>/ over yfdata/<NAME>.json
+    directory, base = os.path.split(f)
+    if base.endswith(".json"):
+        name = base[:-len(".json")]
+        if store.exists(name, directory):
+            return store.read(name, directory)
     try:
     # Read the JSON file into a dictionary
         with open(f, 'r') as json_file:
@@ -97,107 +155,142 @@ def rd_d(f):
 
     return d
 
+def _runs(mask):
+    """(starts, ends) of the runs of True in mask, ends inclusive."""
+    edges = np.diff(np.concatenate(([0], np.asarray(mask, dtype=np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+
+
+def _merge_groups(starts, ends, other_starts):
+    """
+    Group id per run: a run joins the previous one when no run of the
+    other kind starts in the gap between them. Nothing merges when there
+    are no other runs.
+    """
+    other = np.sort(np.asarray(other_starts))
+    merge = np.zeros(len(starts), dtype=bool)
+    if len(other) and len(starts) > 1:
+        between = np.searchsorted(other, starts[1:], 'left') - np.searchsorted(other, ends[:-1], 'right')
+        merge[1:] = between == 0
+    return np.cumsum(~merge) - 1
+
+
 def group_contiguous_elements(lst):
-    if not lst:
+    if not len(lst):
         return []
+    lst = np.asarray(lst)
+    cut = np.flatnonzero(np.diff(lst) != 1) + 1
+    return [g.tolist() for g in np.split(lst, cut)]
 
-    list2d = []
-    current_group = [lst[0]]
 
-    for i in range(1, len(lst)):
-        if lst[i] == lst[i - 1] + 1:
-            current_group.append(lst[i])
-        else:
-            list2d.append(current_group)
-            current_group = [lst[i]]
-    
-    list2d.append(current_group)  # Append the last group
+def merge_ranges(xi, xr):
+    """Join consecutive groups of xi that no group of xr starts between."""
+    if not xi:
+        return []
+    starts = np.array([g[0] for g in xi])
+    ends = np.array([g[-1] for g in xi])
+    groups = _merge_groups(starts, ends, [g[0] for g in xr])
+    merged_xi = [[] for _ in range(groups[-1] + 1)]
+    for g, sub in zip(groups, xi):
+        merged_xi[g] += sub
+    return merged_xi
 
-    return list2d
 
-def merge_ranges(xi, xr):
+def _zones(starts, ends, groups, price, days):
+    """Per merged zone: first/last index, point count, mean price and mean day."""
+    if not len(starts):
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, empty, np.empty(0), np.empty(0)
+    first = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    # prefix sums give every run's sum, reduceat adds the runs of a zone
+    csum_p = np.concatenate(([0.0], np.cumsum(price)))
+    csum_d = np.concatenate(([0.0], np.cumsum(days)))
+    n = np.add.reduceat(ends - starts + 1, first)
+    sp = np.add.reduceat(csum_p[ends+1] - csum_p[starts], first)
+    sd = np.add.reduceat(csum_d[ends+1] - csum_d[starts], first)
+    last = np.r_[first[1:], len(starts)] - 1
+    return starts[first], ends[last], n, sp / n, np.floor(sd / n)
+
+
+ZONE_COLUMNS = ["kind", "start", "end", "first", "last", "points", "price", "date"]
+
+
+def _zone_columns(dates, y, price, threshold_percentage):
+    y = np.asarray(y, dtype=float)
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    days = dates.astype(np.int64).astype(float)
+    price = np.asarray(price, dtype=float)
+
+    ymax, ymin = y.max(), y.min()
+    threshold = (threshold_percentage / 100.0) * (ymax - ymin)
+    min_s, min_e = _runs(np.abs(y - ymin) <= threshold)
+    max_s, max_e = _runs(np.abs(y - ymax) <= threshold)
+
+    # min zones merge around the max runs, max zones around the merged min zones
+    min_g = _merge_groups(min_s, min_e, max_s)
+    min_zone = _zones(min_s, min_e, min_g, price, days)
+    max_g = _merge_groups(max_s, max_e, min_zone[0])
+    max_zone = _zones(max_s, max_e, max_g, price, days)
+
+    first, last, n, p, d = (np.concatenate(pair) for pair in zip(min_zone, max_zone))
+    return {
+        "kind": np.repeat(["min", "max"], [len(min_zone[0]), len(max_zone[0])]),
+        "start": dates[first], "end": dates[last],
+        "first": first, "last": last, "points": n, "price": p,
+        "date": d.astype(np.int64).astype("datetime64[D]"),
+    }
+
+
+def extremum_zones(dates, y, price, threshold_percentage=5):
+    """
+    Zones where y stays within threshold_percentage of its range from its
+    min or max. Runs of the same kind are merged when no run of the other
+    kind starts in between. dates and price are aligned with y. Returns a
+    DataFrame with kind ("min"/"max"), start/end dates, first/last index
+    into y, points, the mean price and the mean date over the zone.
+    """
+    if not len(y):
+        return pd.DataFrame(columns=ZONE_COLUMNS)
+    return pd.DataFrame(_zone_columns(dates, y, price, threshold_percentage), columns=ZONE_COLUMNS)
 
-    merge_list = [False] * len(xi)
-    for i in range(1, len(xi)):
-        first = xi[i][0]
-        prevlast = xi[i-1][len(xi[i-1])-1]
-        for j in range(len(xr)):
-            if prevlast < xr[j][0] < first:
-                merge_list[i] = False
-                break
-            else:
-                merge_list[i] = True
-    
-    lst = []
-    sublst = [0]
-    for i in range(1, len(merge_list)):
-        if merge_list[i]:
-            sublst.append(i)
-        else:
-            lst.append(sublst)
-            sublst = [i]
-    lst.append(sublst)
-
-    merged_xi = []
-    for sublist in lst:
-        subx = []
-        for i in sublist:
-            subx += xi[i]
-        merged_xi.append(subx)
-    return merged_xi
 
-def scan_data(data):
-    DAYS=60
-    ld = len(data["Date"])
-    x = data["Date"][DAYS-1:ld] 
-    y = data["Slope60"]
-    ymax = max(y)
-    ymin = min(y)
-    
-    # Calculate the range of the dataset
-    data_range = ymax - ymin
-    
-    # Calculate the threshold based on the percentage of the range
-    threshold = (5 / 100.0) * data_range   ## 2%
-    xmin_i = []
-    xmax_i = []
-    for i in range(len(x)):
-        valm = abs(y[i] - ymin)
-        valM = abs(y[i] - ymax)
-        #print(valm, valM, threshold)
-        if valm <= threshold:
-            xmin_i.append(i) 
-
-        if valM <= threshold:
-            xmax_i.append(i) 
-
-    xmin_i = group_contiguous_elements(xmin_i)
-    xmax_i = group_contiguous_elements(xmax_i)
-
-    xmin_i = merge_ranges(xmin_i, xmax_i)
-    xmax_i = merge_ranges(xmax_i, xmin_i)
-    
-    for indices in xmin_i:
-        v = 0
-        timestamp = 0
-        for ind in indices:
-            v += data["Adj Close"][ind+DAYS-1] 
-            date = datetime.strptime(data["Date"][ind+DAYS-1], "%Y-%m-%d")
-            timestamp += date.timestamp()
-
-        v = v / len(indices)
-        timestamp = timestamp / len(indices)
-        date = datetime.fromtimestamp(timestamp)
-        date = date.strftime("%Y-%m-%d")
-        print (x[indices[0]], x[indices[len(indices)-1]], v, date)
-    
-    print("MAX")
-    for xxx in xmax_i:
-        print (xxx[0], xxx[len(xxx)-1], x[xxx[0]], x[xxx[len(xxx)-1]])
-  
+def scan_data(data, days=60, threshold_percentage=5):
+    """extremum_zones() of the Slope<days> series of a ticker's data dict."""
+    y = data[f"Slope{days}"]
+    dates = data["Date"][len(data["Date"])-len(y):]
+    price = data["Adj Close"][len(data["Adj Close"])-len(y):]
+    return extremum_zones(dates, y, price, threshold_percentage)
 
-    
 
+def scan_zones(windows=(60, 120, 360), names=None, threshold_percentage=5, directory=store.DIRECTORY):
+    """
+    extremum_zones() of every ticker and slope window in the panel as one
+    table with name and window columns added. first/last index the
+    ticker's own rows, not the panel's date axis.
+    """
+    from stockutils import panel
+    index, dates, values = panel.open_panel(directory)
+    price = values[index["fields"]["Adj Close"]]
+    parts = []
+    for days in windows:
+        block = values[index["fields"][f"Slope{days}"]]
+        for name, t in index["tickers"].items():
+            if names is not None and name not in names:
+                continue
+            row = np.asarray(block[t])
+            # the date axis is the union of all exchanges, keep this ticker's own days
+            valid = ~np.isnan(row)
+            if not valid.any():
+                continue
+            zones = _zone_columns(dates[valid], row[valid], np.asarray(price[t])[valid], threshold_percentage)
+            k = len(zones["kind"])
+            zones["name"] = np.repeat(name, k)
+            zones["window"] = np.repeat(days, k)
+            parts.append(zones)
+    columns = ["name", "window"] + ZONE_COLUMNS
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame({c: np.concatenate([z[c] for z in parts]) for c in columns})
 
 
 def is_close_to_max_min(data, threshold_percentage=5):
@@ -234,78 +327,220 @@ def is_close_to_max_min(data, threshold_percentage=5):
 
 
 def append_yf2d(df, d):
+    return merge_yf2d(df, d)[0]
+
+def append_df2d(df, d):
+    return merge_df2d(df, d)[0]
+
+def merge_yf2d(df, d):
     if df.empty:
-        return d
+        return d, len(d["Date"]) if d else 0
     # Reset the index to move the date from the index to a column
-    df.reset_index(inplace=True)
+    df = df.reset_index()
     # Flatten MultiIndex to get simple column names
-    df.columns = [col[0] for col in df.columns]  # Keep only the first level
-    #print(df.columns)
-    # Convert Date column to string format
-    df["Date"] = df["Date"].apply(lambda x: x.strftime('%Y-%m-%d'))
-    if not d:
-        d = df.to_dict(orient='list')
-        return d
-    l = len(d["Date"])
-    ldate = datetime.strptime(d["Date"][l-1], "%Y-%m-%d")
-    df_start = len(df["Date"])
-    for i,dt in enumerate(df["Date"]):
-        dt = datetime.strptime(dt, "%Y-%m-%d")
-        if dt > ldate:
-            df_start = i
-            break
-    if df_start >= len(df["Date"]):
-        return d
-    nd = {}
-    for col in df.columns:
-        nd[col] = df[col].iloc[df_start:].tolist()
-    for key in nd:
-        d[key] += nd[key]
+    if df.columns.nlevels > 1:
+        df.columns = [col[0] for col in df.columns]  # Keep only the first level
+    return merge_df2d(df, d)
+
+def _day_numbers(dates):
+    """Dates (strings, datetimes or a pandas column) as datetime64[D]."""
+    if isinstance(dates, pd.Series):
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        if getattr(dates.dt, "tz", None) is not None:
+            dates = dates.dt.tz_localize(None)
+        return dates.to_numpy().astype("datetime64[D]")
+    return np.asarray(dates, dtype="datetime64[D]")
+
+def merge_df2d(df, d):
+    """
+    Merge the rows of df into d and return (d, since).
 
-    return d
+    Rows with dates after the last stored date are appended, rows for dates
+    already in d overwrite the stored bar if any value differs (revised
+    bars), rows falling in a gap of d are inserted. since is the first row
+    of d that was added or changed, len(d["Date"]) if nothing changed, and
+    is meant to be passed on to analyse().
+    """
+    if df.empty:
+        return d, len(d["Date"]) if d else 0
+
+    new = _day_numbers(df["Date"])
+    # Sort the new rows and keep the last one of duplicated dates
+    order = np.argsort(new, kind="stable")
+    new = new[order]
+    last = np.append(new[1:] != new[:-1], True)
+    rows = order[last]
+    new = new[last]
+    cols = {}
+    for col in df.columns:
+        if col == "Date":
+            cols[col] = np.datetime_as_string(new, unit="D").tolist()
+        else:
+            cols[col] = df[col].to_numpy()[rows].tolist()
 
-def append_df2d(df, d):
-    ld = datetime.strptime("2000-01-01", "%Y-%m-%d")
     if not d:
-        d = df.to_dict(orient='list')
-        return d
-
-    nd = {}
-    l = len(d["Date"])
-    ldate = datetime.strptime(d["Date"][l-1], "%Y-%m-%d")
-    start_ind = len(df["Date"])
-
-    for i,dt in enumerate(df["Date"]):
-        dt = datetime.strptime(dt, "%Y-%m-%d")
-        if dt > ldate:
-            start_ind = i
-            break
-    
-    if start_ind >= len(df["Date"]):
-        return d
-    
-    for col in df.columns:
-        nd[col] = df[col].iloc[start_ind:].tolist()
-    for key in nd:
-        d[key] += nd[key]
-    return d
+        return cols, 0
+
+    old = _day_numbers(d["Date"])
+    n = len(old)
+    pos = np.searchsorted(old, new)
+    after = pos >= n
+    exists = ~after
+    exists[exists] = old[pos[exists]] == new[exists]
+    inserted = ~exists & ~after
+    keys = [col for col in cols if col != "Date" and col in d]
+
+    # Overwrite stored bars that were revised
+    since = n
+    if exists.any():
+        at = pos[exists].tolist()
+        for col in keys:
+            stored = d[col]
+            vals = np.asarray(cols[col], dtype=object)[exists].tolist()
+            for i, v in zip(at, vals):
+                if stored[i] != v and not (v != v and stored[i] != stored[i]):
+                    stored[i] = v
+                    since = min(since, i)
+
+    if inserted.any():
+        # Rows falling inside the stored range, rebuild the columns in date order
+        since = min(since, int(pos[inserted].min()))
+        add = ~exists
+        idx = np.argsort(np.concatenate([old, new[add]]), kind="stable")
+        d["Date"] = np.asarray(d["Date"] + np.asarray(cols["Date"], dtype=object)[add].tolist(),
+                               dtype=object)[idx].tolist()
+        for col in keys:
+            vals = d[col] + np.asarray(cols[col], dtype=object)[add].tolist()
+            d[col] = np.asarray(vals, dtype=object)[idx].tolist()
+    elif after.any():
+        first = int(np.argmax(after))
+        d["Date"] += cols["Date"][first:]
+        for col in keys:
+            d[col] += cols[col][first:]
+    return d, since
+
+def slope_key(days):
+    return f"Slope{days}"
+
+
+def analyse(name, days, d, since=None, full=False):
+    """
+    Update the slope series of d for the given window length.
+
+    The stored series is kept and only the windows ending on rows that are
+    not covered yet are computed. since is the first row of d that was added
+    or changed (None if rows were only appended), windows reaching into it
+    are recomputed. A full recompute is done when full is set or when the
+    last kept window no longer matches the stored value, i.e. the history
+    was revised behind our back.
+    """
+    analyse_windows(name, [days], d, since, full)
 
-def analyse(name, days, d):
-    if days == 60:
-        key = "Slope60"
-    elif days == 120:
-        key = "Slope120"
-    elif days == 360:
-        key = "Slope360"
-    else:
-        key = "Slope"
-    d[key]=[]
-    
-    for i in range(len(d["Date"])):
-        if i+days == len(d["Date"])+1:
-            break
-        d1 = slope(i,i+days,d)
-        d[key].append(d1["Slope"])
+
+def analyse_windows(name, windows, d, since=None, full=False):
+    """analyse() for several window lengths sharing one pass over the data."""
+    old = {days: ([] if full else d.get(slope_key(days), [])) for days in windows}
+    for days, (new, keep) in update_slopes(d["Adj Close"], d["Volume"], old, since).items():
+        d[slope_key(days)] = list(old[days][:keep]) + new.tolist()
+
+
+def update_slopes(price, volume, old, since=None):
+    """
+    Array core of analyse(): old maps window length -> stored series.
+    Returns window -> (new, keep), the series is old[:keep] followed by
+    new, so callers holding lists only convert the new tail.
+    """
+    keeps = {}
+    for days, prev in old.items():
+        total = max(0, len(price) - days + 1)
+        keep = min(len(prev), total)
+        if since is not None:
+            keep = min(keep, max(0, since - days + 1))
+        if keep > 0:
+            last = rolling_slope(price[keep-1:keep-1+days], volume[keep-1:keep-1+days], days)
+            if not np.isclose(last[0], prev[keep-1], rtol=1e-9, atol=1e-12):
+                keep = 0
+        keeps[days] = keep
+    if not keeps:
+        return {}
+
+    # one pass from the earliest row any window needs
+    first = min(keeps.values())
+    slopes = rolling_slopes(price[first:], volume[first:], list(keeps))
+    return {days: (slopes[days][keep-first:], keep) for days, keep in keeps.items()}
+
+
+def update_slope(price, volume, old, days, since=None):
+    """update_slopes() for one window, returns (new, keep)."""
+    return update_slopes(price, volume, {days: old}, since)[days]
+
+
+def rolling_slope(price, volume, days, chunk=2048):
+    """
+    Slope of every window of length days, same result as calling
+    slope(i, i+days, d) for each window position but done in numpy.
+    """
+    return rolling_slopes(price, volume, [days], chunk)[days]
+
+
+def rolling_slopes(price, volume, windows, chunk=2048):
+    """
+    window -> slope of every window of that length, for all lengths in
+    one pass.
+
+    The windows are built as strided views and the per window
+    accumulations are cumsums along the rows. The regression uses the
+    closed form OLS slope. The accumulations of a window of length w are
+    the first w columns of the accumulations of the longest window starting
+    on the same row, so the cumsums run once at the longest length and every
+    window only slices them.
+    """
+    price = np.asarray(price, dtype=float)
+    volume = np.asarray(volume)
+    windows = list(dict.fromkeys(windows))
+    out = {days: np.empty(0) for days in windows}
+    valid = [days for days in windows if days >= 2 and len(price) - days + 1 > 0]
+    if not valid:
+        return out
+
+    wmax = max(valid)
+    n = len(price) - min(valid) + 1  # rows, one per window start
+    # pad so every start has wmax columns, the padding is never inside a window
+    pad = n - 1 + wmax - len(price)
+    if pad > 0:
+        price = np.concatenate((price, np.full(pad, np.nan)))
+        volume = np.concatenate((volume.astype(float), np.full(pad, np.nan)))
+    trade = np.multiply(volume, price)
+    pw = np.lib.stride_tricks.sliding_window_view(price, wmax)
+    vw = np.lib.stride_tricks.sliding_window_view(volume, wmax)
+    tw = np.lib.stride_tricks.sliding_window_view(trade, wmax)
+
+    # x is centred, the offset of the window does not change the slope
+    xs = {}
+    for days in valid:
+        x = np.arange(days) - (days - 1) / 2.0
+        xs[days] = (x, np.dot(x, x))
+        out[days] = np.empty(len(price) - pad - days + 1)
+
+    for s in range(0, n, chunk):
+        e = min(s + chunk, n)
+        acc_vol = np.cumsum(vw[s:e], axis=1)
+        acc_vol[acc_vol == 0] = 1  ## replace 0 vol with with avoid divide by 0
+        acc_trade = np.cumsum(tw[s:e], axis=1)
+        invst = (pw[s:e] - acc_trade / acc_vol) * vw[s:e]
+        invst = np.cumsum(invst, axis=1)
+        for days in valid:
+            m = min(e, len(out[days])) - s
+            if m <= 0:
+                continue
+            inv = invst[:m, :days]
+            mean = inv.mean(axis=1, keepdims=True)
+            std = inv.std(axis=1, keepdims=True)
+            norm_invst = (inv - mean) / std
+            x, sxx = xs[days]
+            out[days][s:s+m] = norm_invst @ x / sxx
+    return out
 
 
 def plot_i(name, ax, x, y1, y2, xname, y1name):
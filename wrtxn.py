@@ -1,40 +1,6 @@
 #!/usr/bin/env python3
 import pandas as pd
-import re
-
-exchange = {}
-
-# Open the list and read line by line
-with open('list.txt', 'r') as file:
-    current_key = None
-    for line in file:
-        # Strip leading/trailing whitespace
-        line = line.strip()
-        # Replace comma followed by one or more spaces with a comma
-        line = re.sub(r',\s+', ',', line)
-        
-        # Skip empty lines
-        if not line:
-            continue
-        
-        # Split the line into parts
-        parts = line.split(' ', 2)  # Split only on the first two spaces
-        
-        key = parts[0]
-        sym = parts[1]
-        # Remove the square brackets and split the third part into a list
-        names = parts[2].strip('[]').split(',')
-        
-        # Check if the current line contains a new key
-        if key != current_key:
-            current_key = key
-            if current_key not in exchange:
-                exchange[current_key] = {'symbol': [], 'name': []}
-        
-        # Append the name and val to the respective lists
-        exchange[current_key]['symbol'].append(sym)
-        exchange[current_key]['name'].append(names)
-
+from stockutils import universe
 
 # Read old txn
 file_path = 'yfdata/data.csv'
@@ -71,22 +37,24 @@ df['Datum'] = df['Datum'].dt.strftime('%Y-%m-%d')
 df.to_csv('yfdata/data.csv', index=False)
 # Display the filtered DataFrame
 
+# Resolve the security names to SYM.KEY through the alias index
+u = universe.load()
+alias_index = {a: u["tickers"][ysym]["name"] for a, ysym in u["alias"].items()}
+df['Symbol'] = df['Värdepapper/beskrivning'].map(universe.normalize).map(alias_index)
+
+found = df['Symbol'].notna()
+lines = df.loc[found, 'Datum'] + " " + df.loc[found, 'Symbol'] + " " + df.loc[found, 'Typ av transaktion']
+
 output_file = "txn.txt"
 with open(output_file, 'w') as file:
-    for index, row in df.iterrows():
-        found = False
-        for key in exchange:
-            for ind, names in enumerate(exchange[key]['name']):
-                if row['Värdepapper/beskrivning'] in names:
-                    nm = exchange[key]['symbol'][ind] + "." + key
-                    #file.write(f"{row['Datum']}", nm, row['Typ av transaktion'])
-                    print(f"{row['Datum']}", nm, row['Typ av transaktion'], file=file)
-                    found = True
-                    break  # Breaks the inner loop
-            if found:
-                break  # Breaks the outer loop
-        if not found:
-            print(row['Värdepapper/beskrivning']," is not found in the list.txt file")
+    if len(lines):
+        file.write("\n".join(lines) + "\n")
+
+missing = df.loc[~found, 'Värdepapper/beskrivning'].unique()
+if len(missing):
+    print(f"{len(missing)} names are not found in the list.txt file:")
+    for name in missing:
+        print("  " + str(name))
 
 #print(df)
 